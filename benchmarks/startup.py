@@ -0,0 +1,85 @@
+"""
+Cold start time of the tstodlc command.
+
+Every run starts a new interpreter, so modules are never cached between runs. The time of
+an interpreter doing nothing is taken away, leaving only what tstodlc adds to short commands.
+
+Usage:
+
+python benchmarks/startup.py [runs]
+"""
+
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+
+# Milliseconds tstodlc may add to the start of the interpreter.
+BUDGET_MS = 60
+
+# Modules that short commands must not import.
+HEAVY_MODULES = ["zipfile", "tempfile", "xml.etree.ElementTree", "colorama", "tstodlc.tools.index"]
+
+RUN = """
+import sys
+sys.argv = ["tstodlc"] + sys.argv[1:]
+from tstodlc.tools.pack import main
+try:
+    main()
+except SystemExit:
+    pass
+"""
+
+CHECK = RUN + """
+heavy = [module for module in {modules} if module in sys.modules]
+if len(heavy) > 0:
+    sys.exit("--help imported " + ", ".join(heavy))
+"""
+
+
+def time_command(args, runs):
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run(
+            [sys.executable, *args],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            check=True,
+        )
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+
+    checked = subprocess.run(
+        [sys.executable, "-c", CHECK.format(modules=HEAVY_MODULES), "--help"],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    if checked.returncode != 0:
+        sys.exit(checked.stderr.strip())
+
+    baseline = time_command(["-c", "pass"], runs)
+    with tempfile.TemporaryDirectory() as tempdir:
+        commands = {
+            "--help": ["-c", RUN, "--help"],
+            "--view": ["-c", RUN, "--view", tempdir, tempdir],
+        }
+        results = {name: time_command(args, runs) - baseline for name, args in commands.items()}
+
+    print(f"interpreter: {baseline:.1f} ms")
+    for name, overhead in results.items():
+        print(f"{name}: +{overhead:.1f} ms (budget {BUDGET_MS} ms)")
+
+    if any(overhead > BUDGET_MS for overhead in results.values()):
+        sys.exit("Startup budget exceeded!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,534 @@
+import math
+import os
+import re
+import shutil
+import tempfile
+import time
+import zlib
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from zipfile import ZipFile, ZIP_DEFLATED, ZIP_STORED
+from tstodlc.tools.cache import find_blob, write_member
+from tstodlc.tools.fileio import ReadAhead, configure, get_counters, get_options
+from tstodlc.tools.index import (
+    GetIndexTree,
+    GetSubElementAttributes,
+    SearchPackages,
+    UpdatePackageEntry,
+)
+from tstodlc.tools.rawzip import RawZipWriter
+from tstodlc.tools.zerofile import (
+    MAX_FILES,
+    MAX_FILE_SIZE,
+    check_0_limits,
+    write_0_file,
+)
+
+
+# Compression methods for the files within file 1 and for package archives.
+COMPRESSION = {"deflated": ZIP_DEFLATED, "stored": ZIP_STORED}
+
+# Package name made of the component name and optional part and revision suffixes.
+PACKAGE_NAME = re.compile(r"(.+?)(-part\d+)?(-r\d+)?")
+
+
+def split_files(files, shard_size=MAX_FILE_SIZE, sizes=None):
+    # Distribute files into the fewest parts that fit in the 0 file, balancing their sizes.
+    if sizes is None:
+        sizes = {file: file.stat().st_size for file in files}
+    shard_size = max(min(shard_size, MAX_FILE_SIZE), max(sizes.values()))
+    count = max(
+        1,
+        math.ceil(len(files) / MAX_FILES),
+        math.ceil(sum(sizes.values()) / shard_size),
+    )
+    while True:
+        parts = [[0, []] for _ in range(count)]
+        for file in sorted(files, key=sizes.get, reverse=True):
+            part = min(
+                (part for part in parts if len(part[1]) < MAX_FILES),
+                key=lambda part: part[0],
+            )
+            part[0] += sizes[file]
+            part[1].append(file)
+
+        if all(size <= shard_size for size, _ in parts):
+            # Keep the original order of the files within each part.
+            order = {file: i for i, file in enumerate(files)}
+            return [sorted(part, key=order.get) for _, part in parts]
+
+        count += 1
+
+
+def index_packages(subtarget_dir, nozip):
+    # Group installed packages by DLC component. Whole components map to a single package,
+    # sharded components to one package per part. Only the newest revision of each is considered.
+    installed = dict()
+    for item in subtarget_dir.iterdir():
+        if (item.is_dir() is True) != nozip or (nozip is False and item.suffix != ".zip"):
+            continue
+
+        name, part, revision = PACKAGE_NAME.fullmatch(
+            item.name if nozip is True else item.stem
+        ).groups()
+        revision = int(revision[2:]) if revision is not None else 0
+
+        # A part name might as well be the name of a whole component.
+        components = [name, name + part] if part is not None else [name]
+        for component in components:
+            packages = installed.setdefault(component, dict())
+            pkg_name = name + part if part is not None else name
+            if pkg_name not in packages or revision > packages[pkg_name][0]:
+                packages[pkg_name] = (revision, item)
+
+    return {
+        component: {pkg_name: item for pkg_name, (_, item) in packages.items()}
+        for component, packages in installed.items()
+    }
+
+
+def load_local_index(directory, subtarget_dir, args):
+    # Start of DLCIndex file.
+    dlc_index_file = Path(directory, f"DLCIndex-{subtarget_dir.name}.xml")
+    force_install = None if dlc_index_file.exists() else "DLCIndex file was not found"
+
+    # Get tree.
+    tree = GetIndexTree(dlc_index_file, "DlcIndex")
+    root = tree.getroot()
+    root_list = [root]
+
+    # Get revision status.
+    revision_status = bool(
+        int(
+            root_list[0].attrib.get(
+                "revision", "0" if args.norevision is True else "1"
+            )
+        )
+    )
+    root_list[0].set("revision", "0" if args.norevision is True else "1")
+
+    # Create InitialPackages tag.
+    if root.find("InitialPackages") is not None:
+        root_list.append(root.find("InitialPackages"))
+    elif args.initial is True:
+        root_list.append(ET.SubElement(root, "InitialPackages"))
+        force_install = "--initial is set for the first time"
+
+    # Create TutorialPackages tag.
+    if root.find("TutorialPackages") is not None:
+        root_list.append(root.find("TutorialPackages"))
+    elif args.tutorial is True:
+        root_list.append(ET.SubElement(root, "TutorialPackages"))
+        force_install = "--tutorial is set for the first time"
+
+    return (dlc_index_file, tree, root_list, revision_status, force_install)
+
+
+def remove_missing_entries(directory, root_list):
+    for branch in root_list:
+        for pkg in branch.findall("Package"):
+            filepath = Path(
+                GetSubElementAttributes(pkg, "FileName")
+                .get("val", None)
+                .replace(":", os.sep)
+            )
+            filenamesplit = filepath.stem.rsplit("-r", maxsplit=1)
+            filepath = Path(
+                directory,
+                filenamesplit[0]
+                if filenamesplit[-1].isdigit()
+                else filepath.stem,
+            )
+            # Parts of a sharded component belong to the subfolder of that component.
+            if filepath.exists() is False:
+                filepath = Path(directory, PACKAGE_NAME.fullmatch(filepath.name).group(1))
+            # Remove package if subfolder does not exist or if it is empty.
+            if filepath.exists() is False or len(list(filepath.iterdir())) == 0:
+                branch.remove(pkg)
+
+
+def update_entries(packages, root_list, args):
+    # Update index options of installed packages that are not reinstalled.
+    # Returns the number of package entries that actually changed.
+    changed = 0
+    for subpath in packages.values():
+        filename = str(subpath.relative_to(subpath.parent.parent))
+        for root in root_list:
+            changed += UpdatePackageEntry(
+                root_list[0],
+                root,
+                args.platform,
+                args.unzip,
+                args.version,
+                args.tier,
+                None,
+                None,
+                None,
+                filename,
+                filename,
+                args.language,
+            )
+    return changed
+
+
+def get_package_names(directory, root_list):
+    # Names of the components of a DLC and of the packages listed in its local index.
+    return [
+        subdirectory.relative_to(directory.parent)
+        for subdirectory in directory.glob("*")
+        if subdirectory.is_dir() is True
+    ] + [
+        GetSubElementAttributes(pkg, "FileName").get("val", "").replace(":", os.sep)
+        for root in root_list
+        for pkg in root.findall("Package")
+    ]
+
+
+def write_local_index(dlc_index_file, tree):
+    # The file is left untouched if its contents would not change. Returns whether it was written.
+    ET.indent(tree, "  ")
+    xml_file = Path(dlc_index_file.parent, dlc_index_file.stem + ".xml")
+    contents = ET.tostring(tree.getroot())
+    if xml_file.exists() is True and xml_file.read_bytes() == contents:
+        return False
+    xml_file.write_bytes(contents)
+    return True
+
+
+def get_rebuild_reason(subdirectory, packages, force_install, revision_status, args):
+    # Only install subdirectory if it has changed or --priority has been set.
+    # Also, force install if --initial or --tutorial are set for the first time.
+    # Also, force install if --nozip or revision_status is opposite of current revision option.
+    # None means the installed packages are up to date.
+    if force_install is not None:
+        return force_install
+    elif args.nozip is True:
+        return "--nozip is set"
+    elif revision_status != (not args.norevision):
+        return "revision option has changed"
+    elif len(packages) == 0:
+        return "not installed"
+    elif args.priority is not None:
+        return "--priority is set"
+    elif subdirectory.stat().st_mtime_ns >= min(
+        subpath.stat().st_mtime_ns for subpath in packages.values()
+    ):
+        return "files have changed"
+    else:
+        return None
+
+
+def scan_component(subdirectory):
+    # Walk a DLC component once, mapping each of its files to its size. Directories are left out.
+    files = dict()
+    pending = [subdirectory]
+    while len(pending) > 0:
+        with os.scandir(pending.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir() is True:
+                    pending.append(Path(entry.path))
+                elif entry.is_file() is True:
+                    files[Path(entry.path)] = entry.stat().st_size
+    return files
+
+
+def get_source_size(subdirectory):
+    # Number of files and bytes of a DLC component.
+    files = scan_component(subdirectory)
+    return (len(files), sum(files.values()))
+
+
+def build_component(
+    subdirectory,
+    subtarget_dir,
+    packages,
+    priority,
+    epoch_time_sec,
+    args,
+    sizes=None,
+    cache_dir=None,
+):
+    # Pack a DLC component into a package, or into several ones if it has to be sharded.
+    # Index files are not touched. Instead, details about the new packages are returned.
+    # Files and their sizes are taken from sizes when the component has been scanned already.
+    # Compressed files are reused from cache_dir if given.
+    result = {
+        "component": subdirectory.name,
+        "subdirectory": str(subdirectory),
+        "packages": [],
+        "removed": [],
+        "issues": [],
+        "priority": priority,
+        "bytes": 0,
+        "seconds": 0,
+        "files": 0,
+        "cached": 0,
+        "read_bytes": 0,
+        "read_seconds": 0,
+        "wait_seconds": 0,
+    }
+    started = time.perf_counter()
+    counters = get_counters()
+
+    # Get files in current directory.
+    if sizes is None:
+        sizes = scan_component(subdirectory)
+    files = list(sizes)
+
+    # No files at all. Do nothing!
+    if len(files) == 0:
+        result["issues"].append(f"No files found at {subdirectory}.")
+        return result
+
+    # Check the limits of the 0 file format and shard the component if needed.
+    result["issues"] = check_0_limits(subdirectory.name, files, sizes)
+    parts = (
+        split_files(
+            files,
+            MAX_FILE_SIZE if args.shard_size is None else args.shard_size * 1000000,
+            sizes,
+        )
+        if len(result["issues"]) == 0
+        else []
+    )
+    if len(parts) > 1 and args.shard is False:
+        result["issues"].append(
+            f"{len(files)} files with {sum(sizes.values())} bytes do not fit in a single 0 file. Use --shard."
+        )
+    if len(result["issues"]) > 0:
+        return result
+
+    if len(parts) == 1:
+        parts = {subdirectory.name: parts[0]}
+    else:
+        parts = {
+            f"{subdirectory.name}-part{i}": part for i, part in enumerate(parts, start=1)
+        }
+
+    for pkg_name, pkg_files in parts.items():
+        # Get installed subpath and filename.
+        subpath = packages.get(
+            pkg_name,
+            Path(subtarget_dir, pkg_name + ("" if args.nozip is True else ".zip")),
+        )
+
+        filename = str(subpath.relative_to(subpath.parent.parent))
+
+        # Get revision number to create a new revision and replace the previous one.
+        if args.norevision is False:
+            newsubpath = Path(
+                subtarget_dir,
+                pkg_name
+                + f"-r{epoch_time_sec}"
+                + ("" if args.nozip is True else ".zip"),
+            )
+
+        else:
+            newsubpath = Path(
+                subtarget_dir,
+                pkg_name + ("" if args.nozip is True else ".zip"),
+            )
+
+        newfilename = str(newsubpath.relative_to(newsubpath.parent.parent))
+
+        with tempfile.TemporaryDirectory() as tempdir:
+            # Main files.
+            if args.nozip is True:
+                # Write them straight into the destination. The previous files are only
+                # replaced once the new ones are complete.
+                pkg_dir = Path(subtarget_dir, pkg_name)
+                pkg_dir.mkdir(exist_ok=True)
+                file_0 = Path(pkg_dir, "0.tmp")
+                file_1 = Path(pkg_dir, "1.tmp")
+            else:
+                file_0 = Path(tempdir, "0")
+                file_1 = Path(tempdir, "1")
+
+            # Zip all files into file_1. Files compressed by previous builds come from the cache,
+            # the next files that have to be compressed are read ahead while the current one is compressed.
+            cached = {
+                file: blob
+                for file in pkg_files
+                if (
+                    blob := find_blob(
+                        cache_dir, file, COMPRESSION[args.compression], args.compress_level
+                    )
+                )
+                is not None
+            }
+            with (
+                ReadAhead([file for file in pkg_files if file not in cached]) as reader,
+                open(file_1, "wb") as f1,
+                RawZipWriter(f1) as writer,
+            ):
+                for file in pkg_files:
+                    result["cached"] += write_member(
+                        writer,
+                        reader,
+                        file,
+                        file.relative_to(subdirectory).as_posix(),
+                        cache_dir,
+                        COMPRESSION[args.compression],
+                        args.compress_level,
+                        cached.get(file),
+                    )
+            result["files"] += len(pkg_files)
+
+            write_0_file(file_0, file_1, pkg_files, pkg_name, priority)
+            result["bytes"] += sum(sizes[file] for file in pkg_files)
+
+            if args.nozip is True:
+                os.replace(file_1, Path(pkg_dir, "1"))
+                os.replace(file_0, Path(pkg_dir, "0"))
+
+                result["packages"].append(
+                    {
+                        "name": pkg_name,
+                        "filename": filename,
+                        "newfilename": newfilename,
+                        "filesize": None,
+                        "unc_filesize": None,
+                        "crc": None,
+                    }
+                )
+            else:
+                files = [i for i in Path(tempdir).glob("*") if not i.is_dir()]
+                # The new revision only replaces the previous one once it is complete.
+                zip_file = Path(subtarget_dir, newsubpath.name + ".tmp")
+                with ZipFile(
+                    zip_file,
+                    "w",
+                    COMPRESSION[args.outer_compression],
+                    compresslevel=args.compress_level,
+                    strict_timestamps=False,
+                ) as ZObject:
+                    for file in files:
+                        ZObject.write(file, arcname=file.name)
+                # The previous revision is only removed once the index files point to the new one.
+                zip_file = zip_file.replace(newsubpath)
+
+                # Complete file 0 crc32.
+                with open(file_0, "rb") as f0:
+                    file_0_crc32 = zlib.crc32(f0.read()) & 0xFFFFFFFF
+
+                result["packages"].append(
+                    {
+                        "name": pkg_name,
+                        "filename": filename,
+                        "newfilename": newfilename,
+                        "filesize": str(zip_file.stat().st_size // 1000),
+                        "unc_filesize": str(file_1.stat().st_size // 1000),
+                        "crc": str(file_0_crc32),
+                    }
+                )
+
+    # Packages left behind by a previous sharding of this component, removed along with previous revisions.
+    for pkg_name, subpath in packages.items():
+        if pkg_name in parts or (
+            pkg_name != subdirectory.name
+            and Path(subdirectory.parent, pkg_name).is_dir() is True
+        ):
+            continue
+        result["removed"].append(str(subpath.relative_to(subpath.parent.parent)))
+
+    result["seconds"] = time.perf_counter() - started
+
+    # Reads of this component, for the timing report.
+    counters = {key: value - counters[key] for key, value in get_counters().items()}
+    result["read_bytes"] = counters["bytes"]
+    result["read_seconds"] = counters["read_seconds"]
+    result["wait_seconds"] = counters["wait_seconds"]
+    return result
+
+
+def build_components(tasks, epoch_time_sec, args, jobs=1, cache_dir=None):
+    # Pack components in the given order, several at once if jobs > 1.
+    # Each task is yielded along with its result as soon as it finishes.
+    if jobs > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(
+            max_workers=jobs, initializer=configure, initargs=get_options()
+        ) as executor:
+            futures = {
+                executor.submit(
+                    build_component,
+                    task["subdirectory"],
+                    task["subtarget_dir"],
+                    task["packages"],
+                    task["priority"],
+                    epoch_time_sec,
+                    args,
+                    task.get("sizes"),
+                    cache_dir,
+                ): task
+                for task in tasks
+            }
+            for future in as_completed(futures):
+                yield (futures[future], future.result())
+    else:
+        for task in tasks:
+            yield (
+                task,
+                build_component(
+                    task["subdirectory"],
+                    task["subtarget_dir"],
+                    task["packages"],
+                    task["priority"],
+                    epoch_time_sec,
+                    args,
+                    task.get("sizes"),
+                    cache_dir,
+                ),
+            )
+
+
+def remove_replaced(dlc_root, results):
+    # Remove the previous revisions of the packages built and the packages left behind by a previous sharding.
+    # Only called once the index files point to the new packages, so an interrupted run never leaves
+    # index files pointing to removed packages.
+    for result in results:
+        if len(result["issues"]) > 0:
+            continue
+        for package in result["packages"]:
+            previous = Path(dlc_root, package["filename"])
+            if package["filename"] != package["newfilename"] and previous.is_file() is True:
+                os.remove(previous)
+        for filename in result["removed"]:
+            removed = Path(dlc_root, filename)
+            if removed.is_dir() is True:
+                shutil.rmtree(removed)
+            elif removed.is_file() is True:
+                os.remove(removed)
+
+
+def apply_result(result, root_list, removed_names, args):
+    # Add/Update Package in DLCIndex.xml for the packages of a built component.
+    if len(result["issues"]) > 0:
+        return
+
+    root_list[0].set("priority", str(result["priority"]))
+
+    if args.nozip is False:
+        for package in result["packages"]:
+            for root in root_list:
+                UpdatePackageEntry(
+                    root_list[0],
+                    root,
+                    args.platform,
+                    args.unzip,
+                    args.version,
+                    args.tier,
+                    package["filesize"],
+                    package["unc_filesize"],
+                    package["crc"],
+                    package["filename"],
+                    package["newfilename"],
+                    args.language,
+                )
+
+    # Packages that are not installed anymore.
+    for filename in result["removed"]:
+        for root in root_list:
+            for pkg in SearchPackages(root, filename):
+                root.remove(pkg)
+        removed_names.append(filename)
@@ -0,0 +1,227 @@
+import hashlib
+import os
+import struct
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from zipfile import ZIP_DEFLATED
+from colorama import Fore, Style
+from tstodlc.tools import fileio
+from tstodlc.tools.progress import colorprint
+
+
+# Cache of compressed files, shared by every DLC built on this machine.
+CACHE_DIR = Path(os.environ.get("XDG_CACHE_HOME", Path(Path.home(), ".cache")), "tstodlc")
+
+# Each blob starts with the crc32, compressed size and size of the file it holds.
+BLOB_HEADER = struct.Struct("<III")
+
+
+def get_cache_dir(args):
+    # Directory of the cache, or None if it has been disabled.
+    if args.cache_size == 0:
+        return None
+    return Path(args.cache_dir) if args.cache_dir is not None else CACHE_DIR
+
+
+def hash_stream(stream):
+    digest = hashlib.sha256()
+    while chunk := stream.read(fileio.BUFFER_SIZE):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def hash_file(file):
+    with fileio.open_source(file) as f:
+        return hash_stream(f)
+
+
+def get_blob_path(cache_dir, digest, compression, compress_level):
+    # Blobs are addressed by the contents of the file and by how it was compressed.
+    return Path(
+        cache_dir,
+        "blobs",
+        digest[:2],
+        f"{digest}-{compression}-{-1 if compress_level is None else compress_level}",
+    )
+
+
+def read_blob_header(blob):
+    # Crc32 and sizes kept by a blob, or None if it is missing or was left incomplete.
+    try:
+        with open(blob, "rb") as f:
+            header = BLOB_HEADER.unpack(f.read(BLOB_HEADER.size))
+            if os.fstat(f.fileno()).st_size != BLOB_HEADER.size + header[1]:
+                return None
+            return header
+    except (OSError, struct.error):
+        return None
+
+
+def get_key_path(cache_dir, file, stat):
+    # Files compressed before are found by their path, size and times, so they are not read again to be looked up.
+    # The change time can not be set back, so files rewritten since have other keys.
+    key = hashlib.sha256(
+        f"{Path(file).resolve()}\0{stat.st_size}\0{stat.st_mtime_ns}\0{stat.st_ctime_ns}".encode()
+    ).hexdigest()
+    return Path(cache_dir, "files", key[:2], key)
+
+
+def find_blob(cache_dir, file, compression, compress_level):
+    # Blob of a file compressed before along with its header and key, or None if the file has to be compressed.
+    if cache_dir is None or compression != ZIP_DEFLATED:
+        return None
+    key_path = get_key_path(cache_dir, file, file.stat())
+    try:
+        digest = key_path.read_text()
+    except OSError:
+        return None
+    blob = get_blob_path(cache_dir, digest, compression, compress_level)
+    header = read_blob_header(blob)
+    if header is None:
+        return None
+    return (blob, header, key_path)
+
+
+def write_member(writer, reader, file, arcname, cache_dir, compression, compress_level, cached=None):
+    # Add a file to file 1 through the cache. Files compressed before, as found by find_blob, are spliced as they are.
+    # The others are opened from reader, in the order it reads them, compressed and kept for next time.
+    # Blobs are named by the digest of the data compressed, so they always hold what they are named after.
+    # Returns whether the cache had the file.
+    stat = file.stat()
+    date_time = time.localtime(stat.st_mtime)[:6]
+    external_attr = (stat.st_mode & 0xFFFF) << 16
+
+    if cached is not None:
+        blob, header, key_path = cached
+        with open(blob, "rb") as src:
+            src.seek(BLOB_HEADER.size)
+            writer.splice(arcname, src, date_time, compression, *header, external_attr)
+        # Most recently used blobs are the last ones to be evicted.
+        os.utime(blob)
+        os.utime(key_path)
+        return True
+
+    # Stored files cost nothing to write again.
+    if cache_dir is None or compression != ZIP_DEFLATED:
+        with reader.open(file) as src:
+            writer.write(arcname, src, date_time, compression, compress_level, external_attr)
+        return False
+
+    Path(cache_dir).mkdir(parents=True, exist_ok=True)
+    temp_file = Path(cache_dir, f"blob.{os.getpid()}.tmp")
+    digest = hashlib.sha256()
+    try:
+        with reader.open(file) as src, open(temp_file, "wb") as tee:
+            tee.write(bytes(BLOB_HEADER.size))
+            header = writer.write(
+                arcname, src, date_time, compression, compress_level, external_attr, tee, digest
+            )
+            tee.seek(0)
+            tee.write(BLOB_HEADER.pack(*header))
+        blob = get_blob_path(cache_dir, digest.hexdigest(), compression, compress_level)
+        blob.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(temp_file, blob)
+    finally:
+        temp_file.unlink(missing_ok=True)
+
+    # The file is only known by its path if it did not change while it was read.
+    if file.stat().st_ctime_ns == stat.st_ctime_ns:
+        key_path = get_key_path(cache_dir, file, stat)
+        key_path.parent.mkdir(parents=True, exist_ok=True)
+        temp_file = key_path.with_suffix(f".{os.getpid()}.tmp")
+        temp_file.write_text(digest.hexdigest())
+        os.replace(temp_file, key_path)
+    return False
+
+
+def trim_cache(cache_dir, max_bytes):
+    # Remove the least recently used blobs, and files known by their paths, until the cache fits within max_bytes.
+    # Returns the number of blobs and bytes removed.
+    blobs = []
+    for directory in [*Path(cache_dir, "blobs").glob("*"), *Path(cache_dir, "files").glob("*")]:
+        with os.scandir(directory) as scan:
+            for entry in scan:
+                if entry.is_file() is True and entry.name.endswith(".tmp") is False:
+                    stat = entry.stat()
+                    blobs.append((stat.st_mtime_ns, stat.st_size, entry.path))
+
+    total = sum(size for _, size, _ in blobs)
+    removed = [0, 0]
+    for _, size, path in sorted(blobs):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+        removed[0] += 1
+        removed[1] += size
+
+    return tuple(removed)
+
+
+def report_cache(cache_dir, max_bytes, results):
+    # Files taken from the cache by the components just built, then evict what does not fit anymore.
+    files = sum(result.get("files", 0) for result in results)
+    cached = sum(result.get("cached", 0) for result in results)
+    count, size = trim_cache(cache_dir, max_bytes)
+    colorprint(
+        Style.BRIGHT + Fore.CYAN,
+        f"* {cached} of {files} files were taken from the cache"
+        + (f", {count} blobs ({size} bytes) were evicted." if count > 0 else "."),
+    )
+
+
+def report_duplicates(directories, jobs=1):
+    # Files with the same contents shipped more than once, within or across DLC components.
+    files = {
+        file: directory
+        for directory in directories
+        for subdirectory in directory.glob("*")
+        if subdirectory.is_dir() is True
+        for file in subdirectory.rglob("*")
+        if file.is_file() is True
+    }
+    if jobs > 1 and len(files) > 1:
+        with ProcessPoolExecutor(
+            max_workers=jobs, initializer=fileio.configure, initargs=fileio.get_options()
+        ) as executor:
+            digests = list(
+                executor.map(
+                    hash_file, list(files), chunksize=max(1, len(files) // (jobs * 4))
+                )
+            )
+    else:
+        digests = [hash_file(file) for file in files]
+
+    groups = dict()
+    for file, digest in zip(files, digests):
+        groups.setdefault(digest, []).append(file)
+    groups = {digest: group for digest, group in groups.items() if len(group) > 1}
+
+    duplicated_files = 0
+    duplicated_bytes = 0
+    colorprint(Fore.LIGHTWHITE_EX, "-" * 116, "")
+    colorprint(Fore.WHITE, f"{'HASH':<16s}{'SIZE':>12s}  {'FILE':<88s}", "")
+    colorprint(Fore.LIGHTWHITE_EX, "-" * 116, "")
+    for digest, group in sorted(
+        groups.items(), key=lambda item: item[1][0].stat().st_size, reverse=True
+    ):
+        size = group[0].stat().st_size
+        duplicated_files += len(group) - 1
+        duplicated_bytes += size * (len(group) - 1)
+        for i, file in enumerate(sorted(group)):
+            colorprint(
+                Fore.WHITE if i == 0 else Fore.YELLOW,
+                f"{digest[:12] if i == 0 else '':<16s}{str(size) if i == 0 else '':>12s}  "
+                + f"{str(file.relative_to(files[file].parent)):<88s}",
+                "",
+            )
+    colorprint(Fore.LIGHTWHITE_EX, "-" * 116, "")
+
+    colorprint(
+        Style.BRIGHT + Fore.GREEN,
+        f"-> {len(files)} files checked, {duplicated_files} duplicated files with {duplicated_bytes} bytes!",
+    )
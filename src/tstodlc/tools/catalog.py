@@ -0,0 +1,191 @@
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from pathlib import Path
+from zipfile import ZipFile, BadZipFile
+from colorama import Fore, Style
+from tstodlc.tools.index import GetReferencedFiles, GetServerIndexTree, ScanServerTree
+from tstodlc.tools.progress import colorprint
+from tstodlc.tools.zerofile import read_0_file
+
+
+# Catalog of archived files, kept within the server DLC repository.
+CATALOG_FILE = Path(".tstodlc", "catalog.json")
+
+
+def read_package_files(package):
+    # List the archived files of a package as [name, priority, size].
+    # Archives without a 0 file are not packages and give None.
+    try:
+        if package.is_dir() is True:
+            with open(Path(package, "0"), "rb") as f:
+                info = read_0_file(f)
+        else:
+            with ZipFile(package) as ZObject:
+                if "0" not in ZObject.namelist():
+                    return None
+                info = read_0_file(BytesIO(ZObject.read("0")))
+    except (OSError, BadZipFile):
+        return None
+
+    if info is None:
+        return None
+
+    return [
+        [file["name"], file["priority"], file["size"]]
+        for file in info["archived_files"]
+    ]
+
+
+def load_catalog(dlc_root):
+    catalog_file = Path(dlc_root, CATALOG_FILE)
+    if catalog_file.exists() is True:
+        with open(catalog_file, "r") as f:
+            return json.load(f)
+    else:
+        return {"packages": dict()}
+
+
+def save_catalog(dlc_root, catalog):
+    catalog_file = Path(dlc_root, CATALOG_FILE)
+    catalog_file.parent.mkdir(exist_ok=True)
+    temp_file = catalog_file.with_suffix(f".{os.getpid()}.tmp")
+    with open(temp_file, "w") as f:
+        json.dump(catalog, f)
+    os.replace(temp_file, catalog_file)
+
+
+def update_catalog(dlc_root, jobs=1):
+    # Only packages that are new or have changed since last time are parsed again.
+    catalog = load_catalog(dlc_root)
+    archives = {
+        path.as_posix(): stat
+        for path, stat in ScanServerTree(dlc_root).items()
+        if path.name.startswith("DLCIndex") is False
+    }
+    packages = {
+        path: record
+        for path, record in catalog["packages"].items()
+        if path in archives
+    }
+    changed = [
+        path
+        for path, (size, mtime) in archives.items()
+        if path not in packages
+        or packages[path]["size"] != size
+        or packages[path]["mtime"] != mtime
+    ]
+
+    paths = [Path(dlc_root, path) for path in changed]
+    if jobs > 1 and len(paths) > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            results = list(
+                executor.map(
+                    read_package_files,
+                    paths,
+                    chunksize=max(1, len(paths) // (jobs * 4)),
+                )
+            )
+    else:
+        results = [read_package_files(path) for path in paths]
+
+    for path, files in zip(changed, results):
+        size, mtime = archives[path]
+        packages[path] = {"size": size, "mtime": mtime, "files": files}
+
+    if len(changed) > 0 or len(packages) != len(catalog["packages"]):
+        catalog["packages"] = packages
+        save_catalog(dlc_root, catalog)
+
+    return (catalog, len(changed))
+
+
+def get_providers(catalog, referenced=None):
+    # Map each archived filename to the packages that provide it, highest priority first.
+    providers = dict()
+    for path, record in catalog["packages"].items():
+        if record["files"] is None:
+            continue
+        if referenced is not None and Path(path) not in referenced:
+            continue
+        for name, priority, size in record["files"]:
+            providers.setdefault(name, []).append((path, priority, size))
+
+    for entries in providers.values():
+        entries.sort(key=lambda entry: entry[1], reverse=True)
+
+    return providers
+
+
+def analyze_conflicts(dlc_root, who=None, jobs=1):
+    catalog, changed = update_catalog(dlc_root, jobs)
+    colorprint(
+        Style.BRIGHT + Fore.CYAN,
+        f"* Catalog has {len(catalog['packages'])} archives, {changed} of them were parsed again.",
+    )
+
+    # The game only knows about the packages listed in the server index.
+    server_index, server_tree = GetServerIndexTree(Path(dlc_root, "dlc"), "DlcIndex")
+    if server_index is not None and server_tree is not None:
+        referenced = GetReferencedFiles(server_tree)
+    else:
+        colorprint(
+            Style.BRIGHT + Fore.YELLOW,
+            "-> Server DLCIndex was not found! All archives will be considered.",
+        )
+        referenced = None
+
+    providers = get_providers(catalog, referenced)
+
+    if who is not None:
+        for name in who:
+            entries = providers.get(name, [])
+            if len(entries) == 0:
+                colorprint(Style.BRIGHT + Fore.RED, f"- {name} is not provided by any package!")
+                continue
+
+            colorprint(Style.BRIGHT + Fore.LIGHTBLUE_EX, f"-> {name}:", "")
+            for i, (path, priority, size) in enumerate(entries):
+                if i == 0:
+                    status = "tie" if len(entries) > 1 and entries[1][1] == priority else "wins"
+                else:
+                    status = "tie" if priority == entries[0][1] else "shadowed"
+                colorprint(
+                    Fore.WHITE,
+                    f"- {path:<64s} priority: {priority:<6d} size: {size:<12d} {status}",
+                    "",
+                )
+        return
+
+    shadowed_files = 0
+    duplicated_bytes = 0
+    colorprint(Fore.LIGHTWHITE_EX, "-" * 116, "")
+    colorprint(
+        Fore.WHITE,
+        f"{'NAME':<40s}{'PRIORITY':>10s}  {'PROVIDED BY':<64s}",
+        "",
+    )
+    colorprint(Fore.LIGHTWHITE_EX, "-" * 116, "")
+    for name, entries in sorted(providers.items()):
+        if len(entries) < 2:
+            continue
+
+        shadowed_files += len(entries) - 1
+        duplicated_bytes += sum(size for _, _, size in entries[1:])
+        for i, (path, priority, _) in enumerate(entries):
+            if i == 0:
+                style = Fore.YELLOW if entries[1][1] == priority else Fore.GREEN
+            else:
+                style = Fore.YELLOW if priority == entries[0][1] else Fore.WHITE
+            colorprint(
+                style,
+                f"{name if i == 0 else '':<40s}{priority:>10d}  {path:<64s}",
+                "",
+            )
+    colorprint(Fore.LIGHTWHITE_EX, "-" * 116, "")
+
+    colorprint(
+        Style.BRIGHT + Fore.GREEN,
+        f"-> {shadowed_files} shadowed files, {duplicated_bytes} duplicated bytes!",
+    )
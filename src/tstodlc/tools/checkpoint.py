@@ -0,0 +1,64 @@
+import json
+from pathlib import Path
+
+
+# Components packed by the current run, kept within the server DLC repository until the run finishes.
+CHECKPOINT_FILE = Path(".tstodlc", "checkpoint.jsonl")
+
+
+def load_checkpoint(dlc_root):
+    # The first line holds the options of the run and each following line the result of a component.
+    checkpoint_file = Path(dlc_root, CHECKPOINT_FILE)
+    if checkpoint_file.exists() is False:
+        return None
+
+    checkpoint = None
+    with open(checkpoint_file, "r") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                # Last line might have been cut short by a crash.
+                break
+            if checkpoint is None:
+                checkpoint = {"options": entry["options"], "results": dict()}
+            else:
+                checkpoint["results"][entry["subdirectory"]] = entry
+
+    return checkpoint
+
+
+def start_checkpoint(dlc_root, checkpoint):
+    checkpoint_file = Path(dlc_root, CHECKPOINT_FILE)
+    checkpoint_file.parent.mkdir(exist_ok=True)
+    with open(checkpoint_file, "w") as f:
+        f.write(json.dumps({"options": checkpoint["options"]}) + "\n")
+        for result in checkpoint["results"].values():
+            f.write(json.dumps(result) + "\n")
+
+
+def record_component(dlc_root, checkpoint, subdirectory, result):
+    result["mtime"] = subdirectory.stat().st_mtime_ns
+    checkpoint["results"][str(subdirectory)] = result
+    with open(Path(dlc_root, CHECKPOINT_FILE), "a") as f:
+        f.write(json.dumps(result) + "\n")
+
+
+def get_checkpoint_result(dlc_root, checkpoint, subdirectory):
+    # Result of a component packed by an unfinished run, as long as it is still valid.
+    result = checkpoint["results"].get(str(subdirectory))
+    if (
+        result is None
+        or result["mtime"] != subdirectory.stat().st_mtime_ns
+        or any(
+            Path(dlc_root, package["newfilename"]).exists() is False
+            for package in result["packages"]
+        )
+    ):
+        return None
+    else:
+        return result
+
+
+def remove_checkpoint(dlc_root):
+    Path(dlc_root, CHECKPOINT_FILE).unlink(missing_ok=True)
@@ -0,0 +1,198 @@
+import argparse
+import json
+import time
+import xml.etree.ElementTree as ET
+from pathlib import Path
+from colorama import Fore, Style
+from tstodlc.tools.build import (
+    apply_result,
+    build_component,
+    get_package_names,
+    index_packages,
+    load_local_index,
+    remove_missing_entries,
+    remove_replaced,
+    update_entries,
+    write_local_index,
+)
+from tstodlc.tools.cache import report_cache
+from tstodlc.tools.history import record_run
+from tstodlc.tools.index import (
+    GetReferencedFiles,
+    GetServerIndexTree,
+    MergeServerPackages,
+    WriteServerTree,
+)
+from tstodlc.tools.progress import colorprint, report_reads
+from tstodlc.tools.revisions import retain_revisions
+
+
+def get_subtarget_dir(directory, target_dir, args):
+    return Path(target_dir, directory.name) if args.nozip is False else Path(target_dir)
+
+
+def run_node(plan_file, node, target_dir, manifest_file=None, cache_dir=None, cache_size=0):
+    # Build the components a plan has assigned to a node. Index files are left untouched,
+    # the details of the new packages are written to a manifest to be merged later.
+    # The cache of compressed files belongs to the node, it is not part of the plan.
+    with open(plan_file, "r") as f:
+        plan = json.load(f)
+    args = argparse.Namespace(**plan["options"])
+
+    # Get current epoch time.
+    epoch_time_sec = round(time.time())
+
+    if manifest_file is None:
+        manifest_file = Path(plan_file).with_name(f"{Path(plan_file).stem}-node{node}.json")
+
+    installed = dict()
+    priorities = dict()
+    results = []
+    # Longest components first.
+    components = sorted(
+        (
+            component
+            for component in plan["components"]
+            if component["action"] == "rebuild" and component["node"] == node
+        ),
+        key=lambda component: (
+            component["estimate"] if component["estimate"] is not None else 0,
+            component["bytes"],
+        ),
+        reverse=True,
+    )
+    for component in components:
+        directory = Path(component["directory"])
+        subtarget_dir = get_subtarget_dir(directory, target_dir, args)
+        if directory not in installed:
+            subtarget_dir.mkdir(parents=True, exist_ok=True)
+            installed[directory] = index_packages(subtarget_dir, args.nozip)
+            root = load_local_index(directory, subtarget_dir, args)[2][0]
+            priorities[directory] = (
+                int(root.attrib.get("priority", "1"))
+                if args.priority is None
+                else args.priority
+            )
+
+        result = build_component(
+            Path(directory, component["component"]),
+            subtarget_dir,
+            installed[directory].get(component["component"], dict()),
+            priorities[directory],
+            epoch_time_sec,
+            args,
+            cache_dir=cache_dir,
+        )
+        result["directory"] = str(directory)
+        results.append(result)
+
+        if len(result["issues"]) > 0:
+            colorprint(
+                Style.BRIGHT + Fore.RED,
+                f"Warning! {result['component']} can not be packed. Skipping to next subdirectory!",
+            )
+            for issue in result["issues"]:
+                colorprint(Style.BRIGHT + Fore.RED, f"- {issue}", "")
+        for package in result["packages"]:
+            colorprint(
+                Style.BRIGHT + Fore.YELLOW, f"- Added file: {package['newfilename']}", ""
+            )
+
+    with open(manifest_file, "w") as f:
+        json.dump(
+            {
+                "plan": plan["created"],
+                "node": node,
+                "options": plan["options"],
+                "results": results,
+            },
+            f,
+            indent=2,
+        )
+
+    # Remember throughput and build times for estimating future runs.
+    if len(results) > 0:
+        if args.nozip is False:
+            record_run(target_dir, results)
+        report_reads(results)
+        if cache_dir is not None:
+            report_cache(cache_dir, cache_size * 1000000, results)
+
+    colorprint(
+        Style.BRIGHT + Fore.GREEN,
+        f"\n-> Built {len(results)} components of node {node}, results written to {manifest_file}!",
+    )
+
+
+def merge_manifests(manifest_files, target_dir):
+    # Apply the results of every node to the local index files and to the server index at once.
+    manifests = []
+    for manifest_file in manifest_files:
+        with open(manifest_file, "r") as f:
+            manifests.append(json.load(f))
+
+    if len({manifest["plan"] for manifest in manifests}) > 1:
+        colorprint(
+            Style.BRIGHT + Fore.YELLOW,
+            "-> Warning! Manifests come from different plans.",
+        )
+
+    args = argparse.Namespace(**manifests[0]["options"])
+
+    results = dict()
+    for manifest in manifests:
+        for result in manifest["results"]:
+            results.setdefault(Path(result["directory"]), []).append(result)
+
+    server_index, server_tree = GetServerIndexTree(Path(target_dir, "dlc"), "DlcIndex")
+    changed = 0
+    # Packages served before this run, or after it, are the only revisions kept for rollbacks.
+    served = GetReferencedFiles(server_tree) if server_tree is not None else set()
+
+    for directory, directory_results in results.items():
+        subtarget_dir = get_subtarget_dir(directory, target_dir, args)
+        dlc_index_file, tree, root_list, _, _ = load_local_index(
+            directory, subtarget_dir, args
+        )
+
+        # Remove all local entries if their subfolders do not exist anymore!
+        remove_missing_entries(directory, root_list)
+
+        removed_names = []
+        for result in directory_results:
+            apply_result(result, root_list, removed_names, args)
+
+        if args.nozip is True:
+            continue
+
+        # Components that were not rebuilt get their index options updated as usual.
+        built = {result["component"] for result in directory_results}
+        installed = index_packages(subtarget_dir, args.nozip)
+        for subdirectory in directory.glob("*"):
+            if subdirectory.is_dir() is True and subdirectory.name not in built:
+                update_entries(installed.get(subdirectory.name, dict()), root_list, args)
+
+        # Write local tree.
+        if write_local_index(dlc_index_file, tree) is True:
+            colorprint(Style.BRIGHT + Fore.GREEN, f"-> Updated: {dlc_index_file.name}!", "")
+
+        if server_tree is not None:
+            changed += MergeServerPackages(
+                tree,
+                server_tree,
+                get_package_names(directory, root_list),
+                [root.tag for root in root_list],
+                removed_names,
+            )
+
+    if server_index is not None and server_tree is not None and changed > 0:
+        ET.indent(server_tree, "  ")
+        WriteServerTree(server_index, server_tree)
+        colorprint(Style.BRIGHT + Fore.GREEN, f"-> Updated: {server_index.name}!")
+        served |= GetReferencedFiles(server_tree)
+
+    # Packages replaced by the nodes are removed, or kept aside for rollbacks, once nothing points to them.
+    merged = [result for items in results.values() for result in items]
+    if args.keep_revisions > 0 and args.nozip is False:
+        retain_revisions(target_dir, merged, args.keep_revisions, served)
+    remove_replaced(target_dir, merged)
@@ -0,0 +1,186 @@
+import os
+import queue
+import threading
+import time
+
+
+# Bytes read at once from source files.
+BUFFER_SIZE = 1 << 20
+
+# Bytes the read-ahead thread may hold before they are consumed. 0 disables read-ahead.
+READ_AHEAD = 64000000
+
+# Bytes read from files by this process, time spent reading them
+# and time spent waiting for them while packing.
+COUNTERS = {"bytes": 0, "read_seconds": 0.0, "wait_seconds": 0.0}
+COUNTERS_LOCK = threading.Lock()
+
+
+def configure(buffer_size=BUFFER_SIZE, read_ahead=READ_AHEAD):
+    # Also used as initializer of worker processes, so every worker reads alike.
+    global BUFFER_SIZE, READ_AHEAD
+    BUFFER_SIZE = max(buffer_size, 4096)
+    READ_AHEAD = max(read_ahead, 0)
+
+
+def get_options():
+    return (BUFFER_SIZE, READ_AHEAD)
+
+
+def add_counters(size=0, read_seconds=0.0, wait_seconds=0.0):
+    with COUNTERS_LOCK:
+        COUNTERS["bytes"] += size
+        COUNTERS["read_seconds"] += read_seconds
+        COUNTERS["wait_seconds"] += wait_seconds
+
+
+def get_counters():
+    with COUNTERS_LOCK:
+        return dict(COUNTERS)
+
+
+def advise_sequential(f):
+    # Let the kernel read ahead more aggressively where it supports the hint.
+    if hasattr(os, "posix_fadvise") is True:
+        try:
+            os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        except OSError:
+            pass
+
+
+class SourceFile:
+    # File read from start to end with large buffers, counting bytes and time spent.
+    def __init__(self, file, waiting=True):
+        self.f = open(file, "rb", buffering=BUFFER_SIZE)
+        self.waiting = waiting
+        advise_sequential(self.f)
+
+    def read(self, n=-1):
+        started = time.perf_counter()
+        data = self.f.read(n)
+        seconds = time.perf_counter() - started
+        add_counters(len(data), seconds, seconds if self.waiting is True else 0.0)
+        return data
+
+    def close(self):
+        self.f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def open_source(file):
+    return SourceFile(file)
+
+
+class PrefetchedFile:
+    # File whose chunks come from a read-ahead thread.
+    def __init__(self, read_ahead, file):
+        self.read_ahead = read_ahead
+        self.file = file
+        self.data = b""
+        self.offset = 0
+        self.eof = False
+
+    def _next_chunk(self):
+        self.data = self.read_ahead.get_chunk(self.file)
+        self.offset = 0
+        self.eof = len(self.data) == 0
+
+    def read(self, n=-1):
+        # Chunks are handed over as they come, so less than n bytes might be returned before the end.
+        if self.offset == len(self.data) and self.eof is False:
+            self._next_chunk()
+
+        if n < 0:
+            chunks = [self.data[self.offset :]]
+            while self.eof is False:
+                self._next_chunk()
+                chunks.append(self.data)
+            self.offset = len(self.data)
+            return b"".join(chunks)
+
+        end = min(len(self.data), self.offset + n)
+        data = self.data[self.offset : end]
+        self.offset = end
+        return data
+
+    def close(self):
+        # Chunks left behind are skipped, so the next file starts where it should.
+        while self.eof is False:
+            self._next_chunk()
+        self.data = b""
+        self.offset = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class ReadAhead:
+    # Read files in the given order from a background thread, so the next files are being read
+    # while the current one is compressed. At most READ_AHEAD bytes are held at once.
+    # Files have to be opened in the same order, each one once.
+    def __init__(self, files):
+        self.files = list(files)
+        self.queue = queue.Queue(maxsize=max(1, READ_AHEAD // BUFFER_SIZE))
+        self.stopped = threading.Event()
+        self.thread = None
+        if READ_AHEAD > 0 and len(self.files) > 0:
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+
+    def _put(self, item):
+        while self.stopped.is_set() is False:
+            try:
+                self.queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _run(self):
+        for file in self.files:
+            try:
+                with SourceFile(file, waiting=False) as f:
+                    while True:
+                        chunk = f.read(BUFFER_SIZE)
+                        if self._put((file, chunk)) is False:
+                            return
+                        if len(chunk) == 0:
+                            break
+            except OSError as error:
+                if self._put((file, error)) is False:
+                    return
+
+    def get_chunk(self, file):
+        started = time.perf_counter()
+        item_file, chunk = self.queue.get()
+        add_counters(wait_seconds=time.perf_counter() - started)
+        if item_file != file:
+            raise ValueError(f"{file} was opened out of order.")
+        if isinstance(chunk, OSError):
+            raise chunk
+        return chunk
+
+    def open(self, file):
+        if self.thread is None:
+            return SourceFile(file)
+        return PrefetchedFile(self, file)
+
+    def close(self):
+        if self.thread is not None:
+            self.stopped.set()
+            self.thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
@@ -0,0 +1,67 @@
+import json
+import os
+from pathlib import Path
+
+
+# Build history, kept within the server DLC repository.
+HISTORY_FILE = Path(".tstodlc", "history.json")
+
+# Number of runs considered for estimates.
+HISTORY_RUNS = 20
+
+
+def load_history(dlc_root):
+    # Without a dlc_root there is no history, as for nozip installs.
+    if dlc_root is not None and Path(dlc_root, HISTORY_FILE).exists() is True:
+        history_file = Path(dlc_root, HISTORY_FILE)
+        with open(history_file, "r") as f:
+            return json.load(f)
+    else:
+        return {"runs": [], "components": dict()}
+
+
+def save_history(dlc_root, history):
+    history_file = Path(dlc_root, HISTORY_FILE)
+    history_file.parent.mkdir(exist_ok=True)
+    temp_file = history_file.with_suffix(f".{os.getpid()}.tmp")
+    with open(temp_file, "w") as f:
+        json.dump(history, f)
+    os.replace(temp_file, history_file)
+
+
+def record_run(dlc_root, results):
+    # Keep the totals of the run and the latest measurement of each component built.
+    history = load_history(dlc_root)
+    size = sum(result["bytes"] for result in results)
+    seconds = sum(result["seconds"] for result in results)
+    if size > 0:
+        history["runs"] = (history["runs"] + [{"bytes": size, "seconds": seconds}])[
+            -HISTORY_RUNS:
+        ]
+
+    components = history.setdefault("components", dict())
+    for result in results:
+        if result["bytes"] > 0:
+            components[result["subdirectory"]] = {
+                "bytes": result["bytes"],
+                "seconds": result["seconds"],
+            }
+    save_history(dlc_root, history)
+
+
+def get_throughput(history):
+    # Bytes of source files packed per second, or None without history.
+    size = sum(run["bytes"] for run in history["runs"])
+    seconds = sum(run["seconds"] for run in history["runs"])
+    return size / seconds if seconds > 0 else None
+
+
+def estimate_seconds(history, subdirectory, size, throughput=None):
+    # Time to pack a component from its last measurement scaled to its current size,
+    # falling back to the overall throughput. None without any history.
+    component = history.get("components", dict()).get(str(subdirectory))
+    if component is not None and component["bytes"] > 0:
+        return component["seconds"] * size / component["bytes"]
+    if throughput is None:
+        throughput = get_throughput(history)
+    return size / throughput if throughput is not None else None
@@ -1,8 +1,10 @@
 import os
+import shutil
 import tempfile
 import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from zipfile import ZipFile, ZIP_DEFLATED
+from zipfile import ZipFile, ZIP_DEFLATED, is_zipfile
 from colorama import Fore, Style
 from tstodlc.tools.progress import colorprint
 
@@ -105,58 +107,26 @@ def UpdatePackageEntry(
         packages = [ET.Element("Package")]
         branch.insert(0, packages[0])
 
-    # Update packages details.
+    # Update packages details. Packages already up to date are left untouched.
+    changed = False
     for pkg in packages:
         # Get root package or fall back to local package if root package does not exist.
         root_package = root_packages[0] if len(root_packages) > 0 else pkg
 
         # Set package details.
-        (
-            pkg.set(
-                "platform",
-                platform
-                if platform is not None
-                else pkg.attrib.get(
-                    "platform", root_package.attrib.get("platform", "all")
-                ),
-            ),
-        )
-        (
-            pkg.set(
-                "unzip",
-                "true" if unzip is True else root_package.attrib.get("unzip", "false"),
-            ),
-        )
-        (
-            pkg.set(
-                "minVersion",
-                minVersion
-                if minVersion is not None
-                else root_package.attrib.get("minVersion", "4.69.0"),
-            ),
-        )
-        (
-            pkg.set(
-                "tier",
-                tier if tier is not None else root_package.attrib.get("tier", "all"),
-            ),
-        )
-        (
-            pkg.set(
-                "xml",
-                root_package.attrib.get("xml", ""),
-            ),
-        )
-        (
-            pkg.set(
-                "type",
-                root_package.attrib.get("type", ""),
-            ),
-        )
-        pkg.set(
-            "ignore",
-            root_package.attrib.get("ignore", "false"),
-        )
+        attributes = {
+            "platform": platform
+            if platform is not None
+            else pkg.attrib.get("platform", root_package.attrib.get("platform", "all")),
+            "unzip": "true" if unzip is True else root_package.attrib.get("unzip", "false"),
+            "minVersion": minVersion
+            if minVersion is not None
+            else root_package.attrib.get("minVersion", "4.69.0"),
+            "tier": tier if tier is not None else root_package.attrib.get("tier", "all"),
+            "xml": root_package.attrib.get("xml", ""),
+            "type": root_package.attrib.get("type", ""),
+            "ignore": root_package.attrib.get("ignore", "false"),
+        }
 
         # Help with subelements setup.
         def SetValAttributes(value, fallback):
@@ -205,13 +175,35 @@ def UpdatePackageEntry(
             ),
         }
 
+        # Nothing to do if every attribute and subelement already has its value.
+        if all(
+            pkg.attrib.get(key) == value for key, value in attributes.items()
+        ) and all(
+            GetSubElementAttributes(pkg, key, None) == value
+            for key, value in subelements.items()
+        ):
+            continue
+        changed = True
+
+        for key, value in attributes.items():
+            pkg.set(key, value)
+
         for key, value in subelements.items():
             target = pkg.find(key)
             if target is not None:
-                target.attrib = value
+                target.attrib = dict(value)
             else:
                 ET.SubElement(pkg, key, attrib=value)
 
+    return changed
+
+
+def SamePackage(pkg, other):
+    # Compare package entries by their attributes and subelements, leaving out indentation.
+    return pkg.attrib == other.attrib and [
+        (subelement.tag, subelement.attrib) for subelement in pkg
+    ] == [(subelement.tag, subelement.attrib) for subelement in other]
+
 
 def GetServerIndexTree(dlc_dlc, root):
     master_index_zip = Path(dlc_dlc, "DLCIndex.zip")
@@ -232,98 +224,318 @@ def GetServerIndexTree(dlc_dlc, root):
 
 
 def WriteServerTree(server_index, server_tree):
-    with tempfile.TemporaryDirectory() as tempdir:
-        server_index_xml = Path(tempdir, server_index.stem + ".xml")
-        with open(server_index_xml, "wb") as xml_file:
-            server_tree.write(xml_file)
-            zip_file = server_index
-            with ZipFile(zip_file, "w", ZIP_DEFLATED, strict_timestamps=False) as zip:
-                zip.write(server_index_xml, arcname=server_index_xml.name)
-
-
-def UpdateServerIndex(index_file, dlc_dlc, directories_names, branches):
-    if index_file.exists() is True:
-        tree = ET.parse(index_file)
-        # Check if server DLCIndex.zip can be found. If it can, grab dlc_index file from there.
-        server_index, server_tree = GetServerIndexTree(dlc_dlc, "DlcIndex")
-        if server_index is not None and server_tree is not None:
-            local_root = tree.getroot()
-            server_root = server_tree.getroot()
-            for branch in branches:
-                tree_branch = (
-                    local_root if branch == local_root.tag else tree.find(branch)
-                )
-                server_branch = (
-                    server_root
-                    if branch == server_root.tag
-                    else server_tree.find(branch)
+    # The game never sees a server index that is only partially written.
+    zip_file = server_index.with_suffix(f".{os.getpid()}.tmp")
+    try:
+        with ZipFile(zip_file, "w", ZIP_DEFLATED, strict_timestamps=False) as zip:
+            with zip.open(server_index.stem + ".xml", "w") as xml_file:
+                server_tree.write(xml_file)
+        os.replace(zip_file, server_index)
+    finally:
+        zip_file.unlink(missing_ok=True)
+
+
+def MergeServerPackages(tree, server_tree, directories_names, branches, removed_names=()):
+    # Returns the number of server packages that were added, replaced or removed.
+    changed = 0
+    local_root = tree.getroot()
+    server_root = server_tree.getroot()
+    for branch in branches:
+        tree_branch = local_root if branch == local_root.tag else tree.find(branch)
+        server_branch = (
+            server_root if branch == server_root.tag else server_tree.find(branch)
+        )
+        if tree_branch is not None and server_branch is not None:
+            # Remove packages that are not installed anymore.
+            for filename in removed_names:
+                for server_pkg in SearchPackages(server_branch, filename):
+                    server_branch.remove(server_pkg)
+                    changed += 1
+
+            # Grab existing packages.
+            local_packages = list(
+                dict.fromkeys(
+                    package
+                    for directory in directories_names
+                    for package in SearchPackages(tree_branch, directory)
                 )
-                if tree_branch is not None and server_branch is not None:
-                    # Grab existing packages.
-                    local_packages = [
-                        package
-                        for directory in directories_names
-                        for package in SearchPackages(tree_branch, directory)
-                    ]
-
-                    # Update server packages.
-                    for pkg in local_packages:
-                        server_packages = SearchPackages(
-                            server_branch,
-                            GetSubElementAttributes(pkg, "FileName")
-                            .get(
-                                "val",
-                                "",
-                            )
-                            .replace(":", os.sep),
-                        )
-                        for server_pkg in server_packages:
-                            server_branch.remove(server_pkg)
-                        server_branch.insert(0, pkg)
-
-            ET.indent(server_tree, "  ")
-            WriteServerTree(server_index, server_tree)
-            return (True, server_index.name)
-
-        else:
-            return (False, None)
-    else:
-        return (False, None)
-
+            )
 
-def RemoveDeadPackages(dlc_root, branches):
+            # Update server packages that differ from the local ones.
+            for pkg in local_packages:
+                server_packages = SearchPackages(
+                    server_branch,
+                    GetSubElementAttributes(pkg, "FileName")
+                    .get(
+                        "val",
+                        "",
+                    )
+                    .replace(":", os.sep),
+                )
+                if len(server_packages) == 1 and SamePackage(pkg, server_packages[0]):
+                    continue
+                for server_pkg in server_packages:
+                    server_branch.remove(server_pkg)
+                server_branch.insert(0, pkg)
+                changed += 1
+
+    return changed
+
+
+def PackageKey(filename):
+    # Directory and name of a package, leaving out its revision.
+    filepath = Path(filename.replace(":", os.sep))
+    return (filepath.parent.name, SplitRevision(filepath.stem)[0])
+
+
+def RepointPackages(root, updates):
+    # Point packages of every branch to other files. Updates map the current FileName
+    # of a package to the values of its subelements that change. Packages are matched
+    # without their revision, so local entries that lag behind the server are repointed too.
+    updates = {PackageKey(filename): values for filename, values in updates.items()}
+    count = 0
+    for pkg in root.iter("Package"):
+        filename = GetSubElementAttributes(pkg, "FileName").get("val", None)
+        if filename is None or PackageKey(filename) not in updates:
+            continue
+        for key, value in updates[PackageKey(filename)].items():
+            subelement = pkg.find(key)
+            if subelement is None:
+                subelement = ET.SubElement(pkg, key)
+            subelement.set("val", value)
+        count += 1
+    return count
+
+
+def ListDirectory(directory):
+    # Snapshot of a directory's entries. A missing directory has no entries.
+    try:
+        with os.scandir(directory) as scan:
+            return (directory, {entry.name for entry in scan})
+    except (FileNotFoundError, NotADirectoryError):
+        return (directory, set())
+
+
+def RemoveDeadPackages(dlc_root, branches, jobs=1, dry_run=False):
     server_index, server_tree = GetServerIndexTree(Path(dlc_root, "dlc"), "DlcIndex")
     removed = False
     if server_index is not None and server_tree is not None:
         server_root = server_tree.getroot()
-        for branch in branches:
-            server_branch = (
-                server_root if branch == server_root.tag else server_tree.find(branch)
+        server_branches = [
+            server_root if branch == server_root.tag else server_tree.find(branch)
+            for branch in branches
+        ]
+        server_branches = [branch for branch in server_branches if branch is not None]
+
+        # Take a single snapshot of each directory referenced by the packages instead of
+        # checking the existence of every package on its own.
+        directories = {
+            Path(dlc_root, filename.replace(":", os.sep)).parent
+            for server_branch in server_branches
+            for pkg in server_branch.findall("Package")
+            if (filename := GetSubElementAttributes(pkg, "FileName").get("val", None))
+            is not None
+        }
+        if jobs > 1 and len(directories) > 1:
+            with ThreadPoolExecutor(max_workers=jobs) as executor:
+                snapshot = dict(executor.map(ListDirectory, directories))
+        else:
+            snapshot = dict(ListDirectory(directory) for directory in directories)
+
+        for server_branch in server_branches:
+            colorprint(Style.BRIGHT + Fore.CYAN, f"* Checking <{server_branch.tag}>")
+            for pkg in server_branch.findall("Package"):
+                filename = GetSubElementAttributes(pkg, "FileName").get("val", None)
+                if filename is not None:
+                    filename = filename.replace(":", os.sep)
+                    filename = Path(dlc_root, filename)
+                    if filename.name not in snapshot[filename.parent]:
+                        colorprint(
+                            Style.BRIGHT + Fore.YELLOW,
+                            f"- {filename.relative_to(dlc_root)} was not found!",
+                        )
+                        server_branch.remove(pkg)
+                        removed = True
+
+        if removed is False:
+            colorprint(Style.BRIGHT + Fore.GREEN, "-> Nothing to clean!")
+        elif dry_run is True:
+            colorprint(
+                Style.BRIGHT + Fore.GREEN,
+                f"\n-> All packages listed above would be removed from {server_index.name}!",
             )
-            if server_branch is not None:
-                colorprint(
-                    Style.BRIGHT + Fore.CYAN, f"* Checking <{server_branch.tag}>"
-                )
-                for pkg in server_branch.findall("Package"):
-                    filename = GetSubElementAttributes(pkg, "FileName").get("val", None)
-                    if filename is not None:
-                        filename = filename.replace(":", os.sep)
-                        filename = Path(dlc_root, filename)
-                        if filename.exists() is False:
-                            colorprint(
-                                Style.BRIGHT + Fore.YELLOW,
-                                f"- {filename.relative_to(dlc_root)} was not found!",
-                            )
-                            server_branch.remove(pkg)
-                            removed = True
-
-        WriteServerTree(server_index, server_tree)
-        if removed is True:
+        else:
+            WriteServerTree(server_index, server_tree)
             colorprint(
                 Style.BRIGHT + Fore.GREEN,
                 f"\n-> All packages listed above were removed from {server_index.name}!",
             )
-        else:
-            colorprint(Style.BRIGHT + Fore.GREEN, "-> Nothing to clean!")
     else:
         colorprint(Style.BRIGHT + Fore.RED, "-> Server DLCIndex was not found!")
+
+
+def SplitRevision(stem):
+    # Split only if there is actually a number after -r.
+    filenamesplit = stem.rsplit("-r", maxsplit=1)
+    if len(filenamesplit) == 2 and filenamesplit[-1].isdigit():
+        return (filenamesplit[0], int(filenamesplit[-1]))
+    else:
+        return (stem, None)
+
+
+def GetReferencedFiles(server_tree):
+    # Every FileName listed in the server index, no matter the branch it belongs to.
+    referenced = set()
+    for pkg in server_tree.getroot().iter("Package"):
+        filename = GetSubElementAttributes(pkg, "FileName").get("val", None)
+        if filename is not None:
+            referenced.add(Path(filename.replace(":", os.sep)))
+    return referenced
+
+
+def ScanServerTree(dlc_root):
+    # Walk the server dlc tree once, collecting zip archives and nozip package directories.
+    # Paths are stored relative to dlc_root along with their sizes in bytes and modification times.
+    archives = dict()
+    pending = [Path(dlc_root)]
+    while len(pending) > 0:
+        directory = pending.pop()
+        with os.scandir(directory) as scan:
+            entries = list(scan)
+
+        names = {entry.name for entry in entries}
+        if directory != Path(dlc_root) and "0" in names and "1" in names:
+            stats = [entry.stat() for entry in entries if entry.is_file()]
+            archives[directory.relative_to(dlc_root)] = (
+                sum(stat.st_size for stat in stats),
+                max(stat.st_mtime_ns for stat in stats),
+            )
+            continue
+
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                pending.append(Path(entry.path))
+            elif entry.is_file() and entry.name.endswith(".zip"):
+                stat = entry.stat()
+                archives[Path(entry.path).relative_to(dlc_root)] = (
+                    stat.st_size,
+                    stat.st_mtime_ns,
+                )
+
+    return archives
+
+
+def IsPackageArchive(path):
+    if path.is_dir() is True:
+        return Path(path, "0").exists() and Path(path, "1").exists()
+    elif is_zipfile(path) is True:
+        with ZipFile(path) as ZObject:
+            return "0" in ZObject.namelist()
+    else:
+        return False
+
+
+def CollectGarbage(dlc_root, keep=0, dry_run=False, retained=(), nozip=False):
+    server_index, server_tree = GetServerIndexTree(Path(dlc_root, "dlc"), "DlcIndex")
+    if server_index is None or server_tree is None:
+        colorprint(Style.BRIGHT + Fore.RED, "-> Server DLCIndex was not found!")
+        return
+
+    referenced = GetReferencedFiles(server_tree)
+    archives = ScanServerTree(dlc_root)
+
+    # Index files are not packages. Only look at archives that really carry a 0 file.
+    # Revisions kept for rollbacks are not orphans either.
+    orphans = [
+        path
+        for path in archives
+        if path not in referenced
+        and path not in retained
+        and path.name.startswith("DLCIndex") is False
+        and IsPackageArchive(Path(dlc_root, path)) is True
+    ]
+
+    # Nozip installs never write index files, so an unreferenced nozip directory is only known to be stale
+    # once a package of the same component listed in the server index is newer. The others are only removed if nozip is set.
+    superseded = dict()
+    for path in referenced:
+        if path in archives:
+            key = (path.parent, SplitRevision(path.stem)[0])
+            superseded[key] = max(superseded.get(key, 0), archives[path][1])
+    unproven = {
+        path
+        for path in orphans
+        if path.suffix != ".zip"
+        and nozip is False
+        and superseded.get((path.parent, SplitRevision(path.name)[0]), 0) <= archives[path][1]
+    }
+    for path in sorted(unproven):
+        colorprint(
+            Style.BRIGHT + Fore.WHITE,
+            f"- {path} is a nozip package that {server_index.name} might not know about. Use --gc_nozip to remove it.",
+            "",
+        )
+    orphans = [path for path in orphans if path not in unproven]
+
+    # Keep the most recent revisions of each package if requested.
+    revisions = dict()
+    for path in orphans:
+        name, revision = SplitRevision(path.stem if path.suffix == ".zip" else path.name)
+        revisions.setdefault((path.parent, name), []).append((revision or 0, path))
+    retained = {
+        path
+        for group in revisions.values()
+        for _, path in sorted(group, reverse=True)[:keep]
+    }
+    orphans = sorted(path for path in orphans if path not in retained)
+    orphans_set = set(orphans)
+
+    for path in orphans:
+        colorprint(
+            Style.BRIGHT + Fore.YELLOW,
+            f"- {path} is not referenced by {server_index.name}!",
+            "",
+        )
+        if dry_run is False:
+            if Path(dlc_root, path).is_dir() is True:
+                shutil.rmtree(Path(dlc_root, path))
+            else:
+                os.remove(Path(dlc_root, path))
+
+    # Statistics for each directory.
+    stats = dict()
+    for path, (size, _) in archives.items():
+        entry = stats.setdefault(path.parent, [0, 0, 0, 0])
+        entry[0] += 1
+        entry[1] += size
+        if path in orphans_set:
+            entry[2] += 1
+            entry[3] += size
+
+    colorprint(Fore.LIGHTWHITE_EX, "\n" + "-" * 116, "")
+    colorprint(
+        Fore.WHITE,
+        f"{'DIRECTORY':<48s}{'ARCHIVES':>16s}{'BYTES':>20s}{'ORPHANS':>12s}{'ORPHAN BYTES':>20s}",
+        "",
+    )
+    colorprint(Fore.LIGHTWHITE_EX, "-" * 116, "")
+    for directory, (count, size, orphan_count, orphan_size) in sorted(stats.items()):
+        colorprint(
+            Fore.WHITE,
+            f"{str(directory):<48s}{count:>16d}{size:>20d}{orphan_count:>12d}{orphan_size:>20d}",
+            "",
+        )
+    colorprint(Fore.LIGHTWHITE_EX, "-" * 116)
+
+    if len(orphans) == 0:
+        colorprint(Style.BRIGHT + Fore.GREEN, "-> Nothing to collect!")
+    elif dry_run is True:
+        colorprint(
+            Style.BRIGHT + Fore.GREEN,
+            f"-> {len(orphans)} unreferenced archives would be removed ({sum(archives[path][0] for path in orphans)} bytes)!",
+        )
+    else:
+        colorprint(
+            Style.BRIGHT + Fore.GREEN,
+            f"-> {len(orphans)} unreferenced archives were removed ({sum(archives[path][0] for path in orphans)} bytes)!",
+        )
@@ -0,0 +1,434 @@
+import time
+import xml.etree.ElementTree as ET
+from pathlib import Path
+from colorama import Fore, Style
+from tstodlc.tools.index import (
+    GetReferencedFiles,
+    GetServerIndexTree,
+    MergeServerPackages,
+    WriteServerTree,
+)
+from tstodlc.tools.build import (
+    apply_result,
+    build_components,
+    get_package_names,
+    get_rebuild_reason,
+    index_packages,
+    load_local_index,
+    remove_missing_entries,
+    remove_replaced,
+    scan_component,
+    update_entries,
+    write_local_index,
+)
+from tstodlc.tools.cache import get_cache_dir, report_cache
+from tstodlc.tools.checkpoint import (
+    get_checkpoint_result,
+    load_checkpoint,
+    record_component,
+    remove_checkpoint,
+    start_checkpoint,
+)
+from tstodlc.tools.history import estimate_seconds, get_throughput, load_history, record_run
+from tstodlc.tools.plan import BUILD_OPTIONS
+from tstodlc.tools.progress import (
+    colorprint,
+    eta_str,
+    progress_str,
+    report_progress,
+    report_reads,
+)
+from tstodlc.tools.revisions import retain_revisions
+from tstodlc.tools.validate import validate_components
+
+
+def report_result(result, n, total, args, eta=None):
+    if len(result["issues"]) > 0:
+        colorprint(
+            Style.BRIGHT + Fore.RED,
+            f"Warning! {result['component']} can not be packed. Skipping to next subdirectory!",
+        )
+        for issue in result["issues"]:
+            colorprint(Style.BRIGHT + Fore.RED, f"- {issue}", "")
+        return
+
+    for package in result["packages"]:
+        report_progress(
+            progress_str(
+                n,
+                total,
+                Style.BRIGHT
+                + Fore.YELLOW
+                + (
+                    f"- Added directory: {package['name']}\n"
+                    if args.nozip is True
+                    else f"- Added file: {package['newfilename']}\n"
+                )
+                + Style.RESET_ALL,
+                eta,
+            ),
+            "",
+        )
+
+
+def install(directories, args, epoch_time_sec):
+    colorprint(
+        Style.BRIGHT + Fore.MAGENTA,
+        "\n\n--- PACKING FILES INTO 0 and 1 FILES ---\n",
+    )
+
+    # Check there is something to pack.
+    total = sum(
+        (len(list(Path(directory).glob("*/"))) for directory in args.input_dir)
+    )
+
+    if total == 0:
+        colorprint(
+            Style.BRIGHT + Fore.RED,
+            "-> Warning! No subdirectories found under the arguments you have provided.",
+        )
+        colorprint(
+            Style.BRIGHT + Fore.YELLOW,
+            """
+            \r-  Remember that you should specify your DLC directories.
+            \r-  That means that each DLC should be a directory.
+
+            \r-  Within each DLC (each directory) there should be subdirectories
+            \r-  corresponding to DLC components.
+
+            \r-  Within these subdirectories there should be the files corresponding to
+            \r-  that DLC component.
+            """,
+        )
+        colorprint(
+            Style.BRIGHT + Fore.CYAN,
+            "-> An example is given bellow with a DLC that is named 'SuperSecretUpdate'.\n",
+        )
+        colorprint(
+            Style.BRIGHT + Fore.WHITE,
+            "$  tstodlc SuperSecretUpdate/ /path/to/server/dlc/\n",
+        )
+        colorprint(
+            Style.BRIGHT + Fore.CYAN,
+            "** The contents of the ilustrated SuperSecretUpdate directory are shown bellow.\n",
+        )
+        colorprint(Style.BRIGHT + Fore.WHITE, "\t - SuperSecretUpdate/", "")
+        colorprint(Style.BRIGHT + Fore.WHITE, "\t\t - textpools-pt/", "")
+        colorprint(Style.BRIGHT + Fore.WHITE, "\t\t - textpools-en/", "")
+        colorprint(Style.BRIGHT + Fore.WHITE, "\t\t - buildings/", "")
+        colorprint(Style.BRIGHT + Fore.WHITE, "\t\t - decorations/", "")
+        colorprint(Style.BRIGHT + Fore.WHITE, "\t\t - buildings-menu/", "")
+        colorprint(Style.BRIGHT + Fore.WHITE, "\t\t - decorations-menu/", "\n\n")
+        return
+
+    # Set destination of DLC files.
+    target_dir = Path(args.dlc_dir)
+    target_dir.mkdir(exist_ok=True)
+
+    # Components packed by a previous run that did not finish.
+    checkpoint = load_checkpoint(target_dir)
+    options = {option: getattr(args, option) for option in BUILD_OPTIONS}
+    unfinished = set()
+    discarded = []
+    if checkpoint is not None and (
+        args.resume is False or checkpoint["options"] != options
+    ):
+        colorprint(
+            Style.BRIGHT + Fore.YELLOW,
+            "-> Warning! A previous run did not finish"
+            + (
+                " and used different options."
+                if args.resume is True
+                else ". Use --resume to reuse its packages."
+            )
+            + " The components it packed will be packed again.",
+        )
+        unfinished = set(checkpoint["results"])
+        # Packages it replaced are still served until this run replaces them again.
+        discarded = list(checkpoint["results"].values())
+        checkpoint = None
+    if checkpoint is None:
+        checkpoint = {"options": options, "results": dict()}
+
+    # Build times of previous runs, for scheduling and estimating this one.
+    # Nozip installs go straight into the files of the app being patched, so nothing is kept there.
+    history = load_history(target_dir if args.nozip is False else None)
+    throughput = get_throughput(history)
+
+    # Look at each subpackage before packing anything, so the longest components can go first.
+    dlcs = []
+    tasks = []
+    reused = []
+    for directory in directories:
+        if directory.is_dir() is False:
+            colorprint(
+                Style.BRIGHT + Fore.RED,
+                "Warning! "
+                + f"{directory}"
+                + Style.RESET_ALL
+                + Style.BRIGHT
+                + Fore.RED
+                + " is not a directory.",
+            )
+            continue
+
+        # Subdirectory in DLC.
+        subtarget_dir = (
+            Path(target_dir, directory.name)
+            if args.nozip is False
+            else Path(target_dir)
+        )
+        subtarget_dir.mkdir(parents=True, exist_ok=True)
+
+        # Start of DLCIndex file.
+        (
+            dlc_index_file,
+            tree,
+            root_list,
+            revision_status,
+            force_install,
+        ) = load_local_index(directory, subtarget_dir, args)
+
+        # Remove all local entries if their subfolders do not exist anymore!
+        remove_missing_entries(directory, root_list)
+
+        dlc = {
+            "directory": directory,
+            "subtarget_dir": subtarget_dir,
+            "dlc_index_file": dlc_index_file,
+            "tree": tree,
+            "root_list": root_list,
+            # Packages removed because their component changed from whole to sharded or vice-versa.
+            "removed_names": [],
+            # Components that do not have to be packed.
+            "messages": [],
+            # Package entries changed by the given options.
+            "updated": 0,
+        }
+        dlcs.append(dlc)
+
+        # Only apply the given options to the entries of the installed packages.
+        if args.index_only is True:
+            if args.nozip is False:
+                installed = index_packages(subtarget_dir, args.nozip)
+                for subdirectory in directory.glob("*"):
+                    if subdirectory.is_dir() is True:
+                        dlc["updated"] += update_entries(
+                            installed.get(subdirectory.name, dict()), root_list, args
+                        )
+            continue
+
+        # Priority value or build number value.
+        # If two files define the same filenames, the file with the bigger value associated
+        # with it within 0 file will take precedence on usage by the game.
+        # Audios, textpools, gamescripts and non graphical elements usually utilizes 0x0001.
+        priority = (
+            int(root_list[0].attrib.get("priority", "1"))
+            if args.priority is None
+            else args.priority
+        )
+
+        installed = index_packages(subtarget_dir, args.nozip)
+        for subdirectory in (
+            subdirectory
+            for subdirectory in directory.glob("*")
+            if subdirectory.is_dir() is True
+        ):
+            # Get installed packages of this component.
+            packages = installed.get(subdirectory.name, dict())
+
+            # Reuse packages of a previous run that did not finish.
+            result = (
+                get_checkpoint_result(target_dir, checkpoint, subdirectory)
+                if args.nozip is False
+                else None
+            )
+            if result is not None:
+                apply_result(result, root_list, dlc["removed_names"], args)
+                reused.append(result)
+                dlc["messages"].append(
+                    f"- {subdirectory.name} was packed by the previous run!\n"
+                )
+                continue
+
+            # Only install subdirectory if it has changed.
+            reason = get_rebuild_reason(
+                subdirectory, packages, force_install, revision_status, args
+            )
+            if reason is None and str(subdirectory) not in unfinished:
+                dlc["messages"].append(
+                    f"- {subdirectory.name} has not changed since last time!\n"
+                )
+
+                # Update index options.
+                if args.nozip is False:
+                    update_entries(packages, root_list, args)
+
+                continue
+
+            sizes = scan_component(subdirectory)
+            size = sum(sizes.values())
+            tasks.append(
+                {
+                    "dlc": dlc,
+                    "subdirectory": subdirectory,
+                    "subtarget_dir": subtarget_dir,
+                    "packages": packages,
+                    "priority": priority,
+                    "sizes": sizes,
+                    "bytes": size,
+                    "estimate": estimate_seconds(history, subdirectory, size, throughput),
+                }
+            )
+
+    # Find every problem of the components before anything is packed.
+    if len(tasks) > 0:
+        errors = validate_components(
+            [(task["subdirectory"], task["sizes"]) for task in tasks], args
+        )
+        if errors > 0:
+            colorprint(
+                Style.BRIGHT + Fore.RED,
+                "-> Nothing was packed. Fix the errors above and try again.",
+            )
+            return
+        tasks = [task for task in tasks if len(task["sizes"]) > 0]
+
+    if args.index_only is False and args.nozip is False:
+        start_checkpoint(target_dir, checkpoint)
+
+    # Progress is measured in estimated seconds, or in bytes for components never built before.
+    estimated = all(task["estimate"] is not None for task in tasks)
+    for task in tasks:
+        task["cost"] = task["estimate"] if estimated is True else task["bytes"]
+    tasks.sort(key=lambda task: task["cost"], reverse=True)
+    total = sum(task["cost"] for task in tasks)
+    done = 0
+
+    for dlc in dlcs:
+        colorprint(
+            Style.BRIGHT + Fore.LIGHTBLUE_EX,
+            f"-> Archive - {dlc['subtarget_dir'].relative_to(dlc['subtarget_dir'].parent.parent)}:",
+        )
+        for message in dlc["messages"]:
+            report_progress(
+                progress_str(
+                    done,
+                    total,
+                    Style.BRIGHT + Fore.WHITE + message + Style.RESET_ALL,
+                ),
+                "",
+            )
+
+    # Expected amount of work done per second, counting every worker.
+    workers = max(1, min(args.jobs, len(tasks)))
+    if estimated is True:
+        rate = workers
+    elif throughput is not None:
+        rate = throughput * workers
+    else:
+        rate = None
+
+    # Start the packaging operation.
+    if len(tasks) > 0:
+        colorprint(
+            Style.BRIGHT + Fore.LIGHTBLUE_EX,
+            f"\n-> Packing {len(tasks)} components"
+            + (f", estimated in {eta_str(total / rate)}:" if rate is not None else ":"),
+        )
+
+    results = []
+    started = time.perf_counter()
+    cache_dir = get_cache_dir(args)
+    for task, result in build_components(
+        tasks, epoch_time_sec, args, args.jobs, cache_dir
+    ):
+        dlc = task["dlc"]
+        apply_result(result, dlc["root_list"], dlc["removed_names"], args)
+        if args.nozip is False and len(result["issues"]) == 0:
+            record_component(target_dir, checkpoint, task["subdirectory"], result)
+        results.append(result)
+
+        # Follow the pace of the components finished so far, unless counting down
+        # from the estimate is sooner, as it is while other workers are still busy.
+        done += task["cost"]
+        elapsed = time.perf_counter() - started
+        eta = elapsed * (total - done) / done if done > 0 else None
+        if rate is not None and total / rate > elapsed:
+            eta = min(eta, total / rate - elapsed) if eta is not None else total / rate - elapsed
+        report_result(result, done, total, args, eta)
+
+    # The server index is read once and only written if any DLC changed it.
+    server_index, server_tree = (
+        GetServerIndexTree(Path(args.dlc_dir, "dlc"), "DlcIndex")
+        if args.nozip is False
+        else (None, None)
+    )
+    changed = 0
+    # Packages served before this run, or after it, are the only revisions kept for rollbacks.
+    served = GetReferencedFiles(server_tree) if server_tree is not None else set()
+
+    for dlc in dlcs:
+        subtarget_dir = dlc["subtarget_dir"]
+        if args.index_only is False:
+            colorprint(
+                Style.BRIGHT + Fore.GREEN,
+                f"\n\n-> Sucessfully installed files in {subtarget_dir.relative_to(subtarget_dir.parent.parent)}!",
+            )
+        elif args.nozip is False:
+            colorprint(
+                Style.BRIGHT + Fore.GREEN,
+                f"\n\n-> {dlc['updated']} package entries of {subtarget_dir.name} were updated!",
+            )
+
+        if args.nozip is False:
+            # Write local tree.
+            if write_local_index(dlc["dlc_index_file"], dlc["tree"]) is True:
+                colorprint(
+                    Style.BRIGHT + Fore.GREEN, f"-> Updated: {dlc['dlc_index_file'].name}!"
+                )
+
+            # Update server tree if possible.
+            if server_tree is not None:
+                changed += MergeServerPackages(
+                    dlc["tree"],
+                    server_tree,
+                    get_package_names(dlc["directory"], dlc["root_list"]),
+                    [root.tag for root in dlc["root_list"]],
+                    dlc["removed_names"],
+                )
+
+    if server_index is not None and server_tree is not None:
+        served |= GetReferencedFiles(server_tree)
+        if changed > 0:
+            ET.indent(server_tree, "  ")
+            WriteServerTree(server_index, server_tree)
+            colorprint(Style.BRIGHT + Fore.GREEN, f"-> Updated: {server_index.name}!")
+        else:
+            colorprint(
+                Style.BRIGHT + Fore.GREEN, f"-> {server_index.name} is up to date!"
+            )
+
+    # Packages replaced by this run are removed, or kept aside for rollbacks, once nothing points to them.
+    # Those replaced by an unfinished run too, as long as their components were packed again.
+    built = {result["subdirectory"] for result in results if len(result["issues"]) == 0}
+    discarded = [result for result in discarded if result["subdirectory"] in built]
+    if args.keep_revisions > 0 and args.nozip is False and len(results + reused) > 0:
+        retain_revisions(
+            target_dir, discarded + results + reused, args.keep_revisions, served
+        )
+    remove_replaced(target_dir, discarded + results + reused)
+
+    # All index files are written, nothing has to be resumed anymore.
+    if args.index_only is False and args.nozip is False:
+        remove_checkpoint(target_dir)
+
+    # Remember throughput and build times for estimating future runs.
+    if len(results) > 0:
+        if args.nozip is False:
+            record_run(target_dir, results)
+        report_reads(results)
+        if cache_dir is not None:
+            report_cache(cache_dir, args.cache_size * 1000000, results)
+
+    colorprint(Style.BRIGHT + Fore.MAGENTA, "\n--- JOB COMPLETED!!! ---\n")
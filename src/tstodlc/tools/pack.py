@@ -1,111 +1,9 @@
 import argparse
-import zlib
-import tempfile
-import shutil
-import os
 import time
-import xml.etree.ElementTree as ET
 from pathlib import Path
-from zipfile import ZipFile, ZIP_DEFLATED, is_zipfile
-from colorama import Fore, Style, init
-from tstodlc.tools.index import (
-    GetIndexTree,
-    GetSubElementAttributes,
-    UpdatePackageEntry,
-    UpdateServerIndex,
-    RemoveDeadPackages,
-)
-from tstodlc.tools.progress import progress_str, report_progress, colorprint
-
-def read_bytestr(file_descriptor, n):
-    return file_descriptor.read(n).rstrip(b"\x00").decode("utf8")
-
-
-def write_str_to_file(file_descriptor, str_name):
-    # String length.
-    skip = len(str_name) + 1
-    file_descriptor.write(skip.to_bytes())
-
-    # String.
-    file_descriptor.write(str_name.encode())
-    file_descriptor.write(b"\x00")
-
-
-def view_0_file(file_0, filename, show = False):
-
-    # Check if 0 file really exists and it is not a directory.
-    if file_0.exists() is True:
-        with open(file_0, "rb") as f:
-
-            # Check 0 file signature.
-            if f.read(6) != b"\x42\x47\x72\x6d\x03\x02":
-                return
-
-            # Read all info.
-            size_0 = int.from_bytes(f.read(4))
-
-            f.read(3)
-
-            original_dir = read_bytestr(f, int.from_bytes(f.read(1)))
-
-            zip_files = [{"name": "1", "crc32": "0"} for _ in range(int.from_bytes(f.read(2)))]
-
-            for zip_file in zip_files:
-                f.read(2)
-                zip_file["name"] = read_bytestr(f, int.from_bytes(f.read(1)))
-
-                f.read(1)
-                zip_file["crc32"] = str(int.from_bytes(f.read(4)))
-
-            number_files = int.from_bytes(f.read(2))
-
-            archived_files = [{"name": "nofile.empty", "extension": "empty", "size": 0, "priority": 0} for _ in range(max(1, number_files))]
-            if number_files > 0:
-                for file in archived_files:
-                    f.read(2)
-                    file["name"] = read_bytestr(f, int.from_bytes(f.read(1)))
-                    file["extension"] = read_bytestr(f, int.from_bytes(f.read(1)))
-                    f.read(int.from_bytes(f.read(1)))
-                    file["size"] = int.from_bytes(f.read(4))
-                    file["priority"] = int.from_bytes(f.read(2))
-                    f.read(2)
-
-
-            # To help with formating.
-            min_padding = max((len(file['name']) for file in archived_files))
-            delimiters = max(116, 81 + min_padding)
-
-            crc32 = int.from_bytes(f.read(4))
-
-            colorprint(Fore.LIGHTWHITE_EX, "=" * delimiters)
-            colorprint(
-                Fore.LIGHTWHITE_EX,
-                f"\n {filename} \n",
-            )
-
-            colorprint(Fore.LIGHTWHITE_EX, "-" * delimiters)
-
-            colorprint(Fore.WHITE, f"* Original directory: {original_dir}")
-            colorprint(Fore.WHITE, f"* First priority: {archived_files[0]["priority"]}")
-            colorprint(Fore.WHITE, "* Archive list:")
-            colorprint(Fore.WHITE, f"- [0] --- CRC32: {crc32}")
-            for zip_file in zip_files:
-                colorprint(Fore.WHITE, f"- [{zip_file["name"]}] --- CRC32: {zip_file["crc32"]}")
-
-            # Print list of files if required.
-            if show is True:
-                colorprint(Fore.LIGHTWHITE_EX, "-" * delimiters)
-                colorprint(Fore.WHITE, f"{'PRIORITY':<9s}" + " " * 10 + f"{'NAME':<{min_padding}s}" + " " * 10 + f"{'DIRECTORY':<32s}")
-                colorprint(Fore.LIGHTWHITE_EX, "-" * delimiters)
-                for file in archived_files:
-                    colorprint(Fore.WHITE, f"{file['priority']:<9d}" + " " * 10  + f"{file['name']:<{min_padding}s}" + " " * 10 + f"{str(filename.name):<32s}")
-                colorprint(Fore.LIGHTWHITE_EX, "-" * delimiters)
 
 
 def main():
-    # Init colorama.
-    init()
-
     # Get current epoch time.
     epoch_time_sec = round(time.time())
 
@@ -186,6 +84,15 @@ def main():
         action="store_true",
     )
 
+    parser.add_argument(
+        "--resume",
+        help="""
+        Reuse the packages made by a previous run that did not finish, for example because it crashed,
+        and only pack the remaining DLC components before updating the index files.
+        """,
+        action="store_true",
+    )
+
     parser.add_argument(
         "-n",
         "--nozip",
@@ -193,6 +100,131 @@ def main():
         action="store_true",
     )
 
+    parser.add_argument(
+        "--shard",
+        help="""
+        Split DLC components that do not fit in a single 0 file into several packages
+        named component-part1, component-part2 and so on, each one with its own 0 and 1 files.
+        """,
+        action="store_true",
+    )
+
+    parser.add_argument(
+        "--shard_size",
+        help="Maximum size in megabytes of the files of each package when --shard is set. Smaller packages can be downloaded in parallel.",
+        type=int,
+    )
+
+    parser.add_argument(
+        "--compression",
+        help="Compression of the files within file 1 of each package.",
+        choices=["deflated", "stored"],
+        default="deflated",
+    )
+
+    parser.add_argument(
+        "--outer_compression",
+        help="Compression of the 0 and 1 files within the zip file of each package.",
+        choices=["deflated", "stored"],
+        default="deflated",
+    )
+
+    parser.add_argument(
+        "--compress_level",
+        help="Compression level from 0 to 9 for deflated files. Defaults to the zlib default level.",
+        type=int,
+        choices=range(10),
+    )
+
+    parser.add_argument(
+        "--cache_dir",
+        help="Directory of the cache of compressed files enabled by --cache_size. Defaults to ~/.cache/tstodlc.",
+    )
+
+    parser.add_argument(
+        "--cache_size",
+        help="""
+        Maximum size in megabytes of the cache of compressed files. Files that did not change since they
+        were compressed are taken from the cache instead of being compressed again.
+        The least recently used files are evicted first. The cache is disabled by default, or with 0.
+        """,
+        type=int,
+        default=0,
+    )
+
+    parser.add_argument(
+        "--buffer_size",
+        help="Size in kilobytes of each read from source files. Bigger reads help on network mounts.",
+        type=int,
+        default=1024,
+    )
+
+    parser.add_argument(
+        "--read_ahead",
+        help="""
+        Megabytes of upcoming source files that are read in the background while the current one is compressed.
+        Useful when reading is slow, such as on network mounts. Use 0 to disable it.
+        """,
+        type=int,
+        default=64,
+    )
+
+    parser.add_argument(
+        "--duplicates",
+        help="List files with the same contents found more than once within or across DLC components.",
+        action="store_true",
+    )
+
+    parser.add_argument(
+        "--check",
+        help="""
+        Check that the files of every DLC component can be packed, for example that there are no duplicated
+        names within nested directories, and report all problems found. Nothing is packed.
+        Problems are also checked before a normal run packs anything.
+        """,
+        action="store_true",
+    )
+
+    parser.add_argument(
+        "--plan",
+        help="""
+        Write a JSON plan to the given file (use - for standard output) telling which DLC components would be
+        reinstalled and why, their sizes and an estimate of the time it would take. Nothing is packed.
+        """,
+    )
+
+    parser.add_argument(
+        "--split",
+        help="Split the components of --plan between this many nodes, so each one can be built on a different machine with --work.",
+        type=int,
+    )
+
+    parser.add_argument(
+        "--work",
+        help="""
+        Build the components a plan assigned to a node (see --node) and write the results to a manifest.
+        Index files are not updated, use --merge once every node has finished.
+        """,
+    )
+
+    parser.add_argument(
+        "--node",
+        help="Node of the plan to build with --work.",
+        type=int,
+        default=1,
+    )
+
+    parser.add_argument(
+        "--manifest",
+        help="File where --work writes its results. Defaults to the name of the plan followed by the node number.",
+    )
+
+    parser.add_argument(
+        "--merge",
+        help="Update DLCIndex-XXXX.xml files and server DLCIndex-XXXX.xml with the results of a manifest. Can be given multiple times.",
+        action="append",
+    )
+
     parser.add_argument(
         "-v",
         "--view",
@@ -222,6 +254,177 @@ def main():
         action="store_true",
     )
 
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        help="""
+        Number of workers used to pack DLC components, and to scan directories and parse packages
+        of the server DLC repository. Useful for multi-core machines and network mounts.
+        """,
+        type=int,
+        default=1,
+    )
+
+    parser.add_argument(
+        "--gc",
+        help="""
+        Remove package archives that are not referenced by server DLCIndex-XXXX.xml
+        and print per-directory statistics of the server DLC repository.
+        Nozip directories are only removed once server DLCIndex-XXXX.xml lists a newer package of the same component, or with --gc_nozip.
+        When --gc is requested, normal operations (packing DLCs and such) will not happen.
+
+        Suggestion of usage:
+
+        tstodlc --gc . /path/to/server_dlc_directory
+        """,
+        action="store_true",
+    )
+
+    parser.add_argument(
+        "--repack",
+        help="""
+        Write new revisions of the packages of the DLCs given as input_dir listed in server DLCIndex-XXXX.xml
+        using the given --compression, --outer_compression and --compress_level, and point the index files to them.
+        Files already compressed with the requested method are copied without being decompressed.
+        When --repack is requested, normal operations (packing DLCs and such) will not happen.
+
+        Suggestion of usage:
+
+        tstodlc --repack --outer_compression stored /path/to/SuperSecretUpdate/ /path/to/server_dlc_directory
+        """,
+        action="store_true",
+    )
+
+    parser.add_argument(
+        "--unpack",
+        help="""
+        Extract the packages of the server DLC repository back into the DLC directories given as input_dir,
+        one subdirectory per DLC component, and recreate their DLCIndex-XXXX.xml files.
+        The name of each input_dir must be the name of the DLC within the server DLC repository.
+        When --unpack is requested, normal operations (packing DLCs and such) will not happen.
+
+        Suggestion of usage:
+
+        tstodlc --unpack /path/to/SuperSecretUpdate/ /path/to/server_dlc_directory
+        """,
+        action="store_true",
+    )
+
+    parser.add_argument(
+        "--recompress",
+        help="Compress again every file within file 1 when using --repack, even if it could be copied.",
+        action="store_true",
+    )
+
+    parser.add_argument(
+        "--query",
+        help="""
+        List the packages of server DLCIndex-XXXX.xml matching every --where and --since given,
+        along with their amount and total size.
+
+        Suggestion of usage:
+
+        tstodlc --query --where branch=InitialPackages --where tier=100 . /path/to/server_dlc_directory
+        """,
+        action="store_true",
+    )
+
+    parser.add_argument(
+        "--where",
+        help="Condition key=value for --query, with key being one of branch, dlc, language, tier, platform or minVersion. Can be given multiple times.",
+        action="append",
+    )
+
+    parser.add_argument(
+        "--since",
+        help="Only query packages with a revision newer than the given epoch time.",
+        type=int,
+    )
+
+    parser.add_argument(
+        "--output",
+        help="Print the results of --query as a table or as JSON.",
+        choices=["table", "json"],
+        default="table",
+    )
+
+    parser.add_argument(
+        "--keep_revisions",
+        help="""
+        Number of revisions of each package to keep, the live one included, so packages can be rolled back
+        with --rollback. Previous revisions are moved to .tstodlc/revisions within the server DLC repository.
+        By default previous revisions are removed.
+        """,
+        type=int,
+        default=0,
+    )
+
+    parser.add_argument(
+        "--rollback",
+        help="""
+        Point the packages of the DLCs given as input_dir back to their previous revision kept by --keep_revisions,
+        updating the local and server DLCIndex files without packing anything.
+        When --rollback is requested, normal operations (packing DLCs and such) will not happen.
+
+        Suggestion of usage:
+
+        tstodlc --rollback /path/to/SuperSecretUpdate/ /path/to/server_dlc_directory
+        """,
+        action="store_true",
+    )
+
+    parser.add_argument(
+        "--to",
+        help="Roll back to the newest revision kept that is not newer than the given epoch time.",
+        type=int,
+    )
+
+    parser.add_argument(
+        "--component",
+        help="Only roll back the packages of the given DLC component. Can be given multiple times.",
+        action="append",
+    )
+
+    parser.add_argument(
+        "--keep",
+        help="Number of the most recent unreferenced revisions of each package that --gc should keep.",
+        type=int,
+        default=0,
+    )
+
+    parser.add_argument(
+        "--gc_nozip",
+        help="Also let --gc remove unreferenced nozip directories that no newer package listed in server DLCIndex-XXXX.xml replaces.",
+        action="store_true",
+    )
+
+    parser.add_argument(
+        "--dry_run",
+        "--dry-run",
+        help="Only report what --clean or --gc would remove without removing anything.",
+        action="store_true",
+    )
+
+    parser.add_argument(
+        "--conflicts",
+        help="""
+        List files provided by more than one package of the server DLC repository,
+        showing which package wins according to the priorities in the 0 files.
+        The catalog of archived files is kept in the server DLC repository and only changed packages are parsed again.
+
+        Suggestion of usage:
+
+        tstodlc --conflicts . /path/to/server_dlc_directory
+        """,
+        action="store_true",
+    )
+
+    parser.add_argument(
+        "--who",
+        help="Show which packages provide the given file and which one wins. Can be given multiple times.",
+        action="append",
+    )
+
     parser.add_argument(
         "input_dir",
         help="List of directories containing the DLC files.",
@@ -235,513 +438,215 @@ def main():
 
     args = parser.parse_args()
 
+    # Modules are only imported once the arguments tell what they are needed for,
+    # so short commands and --help start quickly.
+    from colorama import Fore, Style, init
+    from tstodlc.tools.progress import colorprint
+
+    # Init colorama.
+    init()
+
+    # How source files are read.
+    from tstodlc.tools.fileio import configure
+
+    configure(args.buffer_size * 1024, args.read_ahead * 1000000)
 
     # List of input directories. Convert them to absolute paths.
     directories = [Path(item).resolve() for item in args.input_dir]
 
     # Inspecting DLC files.
     if args.view is True or args.show is True:
+        from tstodlc.tools.view import view_packages
 
-        print("\n")
-        status = False
-
-        # Search for subdirectories and zip files.
-        for directory in directories:
-            # Check if it is really a directory.
-            if directory.is_dir() is True:
-                file_0 = Path(directory, "0")
-                if file_0.exists() is True:
-                    view_0_file(file_0, directory.relative_to(directory.parent.parent), args.show)
-                    status = True
-
-                # Inspect all subdirectories and files if there is any.
-                for item in directory.iterdir():
-
-                    # Normal subdirectories. Check 0 file presence and copy it to tempdir.
-                    if item.is_dir():
-                        file_0 = Path(item, "0")
-                        if file_0.exists() is True:
-                            view_0_file(file_0, item.relative_to(directory.parent), args.show)
-                            status = True
-
-                    # Zip files. Extract 0 file to tempdir.
-                    elif item.suffix == ".zip" and is_zipfile(item) is True:
-                        with tempfile.TemporaryDirectory() as tempdir:
-                            file_0 = Path(tempdir, "0")
-                            with ZipFile(item) as ZObject:
-                                if "0" in ZObject.namelist():
-                                    ZObject.extract("0", file_0.parent)
-                                    view_0_file(file_0, item.relative_to(directory.parent), args.show)
-                                    status = True
-
-
-            # Check if it instead is a zip file.
-            elif directory.suffix == ".zip" and is_zipfile(directory) is True:
-                with tempfile.TemporaryDirectory() as tempdir:
-                    file_0 = Path(tempdir, "0")
-                    with ZipFile(directory) as ZObject:
-                        if "0" in ZObject.namelist():
-                            ZObject.extract("0", file_0.parent)
-                            view_0_file(file_0, directory.relative_to(directory.parent.parent), args.show)
-                            status = True
-
-
-
-        if status is True:
-            if args.show is False:
-                colorprint(Fore.LIGHTWHITE_EX, "=" * 116)
-        else:
-            colorprint(
-                Style.BRIGHT + Fore.RED,
-                "  Warning! No DLC files for inspecting found under the arguments you have provided.",
-            )
-        print("\n")
+        view_packages(directories, args.show)
 
     # Cleaning dead packages.
     elif args.clean is True:
+        from tstodlc.tools.index import RemoveDeadPackages
+
         colorprint(
             Style.BRIGHT + Fore.MAGENTA,
             "\n\n--- CLEANING MISSING PACKAGES FROM SERVER DLCIndex ---\n\n",
         )
         RemoveDeadPackages(
-            Path(args.dlc_dir), ["DlcIndex", "InitialPackages", "TutorialPackages"]
+            Path(args.dlc_dir),
+            ["DlcIndex", "InitialPackages", "TutorialPackages"],
+            args.jobs,
+            args.dry_run,
         )
 
         colorprint(Style.BRIGHT + Fore.MAGENTA, "\n--- JOB COMPLETED!!! ---\n")
 
+    # Analyzing files provided by multiple packages.
+    elif args.conflicts is True or args.who is not None:
+        from tstodlc.tools.catalog import analyze_conflicts
 
-    # Normal operation.
-    else:
         colorprint(
             Style.BRIGHT + Fore.MAGENTA,
-            "\n\n--- PACKING FILES INTO 0 and 1 FILES ---\n",
+            "\n\n--- ANALYZING ARCHIVED FILES FROM SERVER DLC REPOSITORY ---\n\n",
         )
+        analyze_conflicts(Path(args.dlc_dir), args.who, args.jobs)
 
-        # Help with the progress report.
-        n = 0
-        total = sum(
-            (len(list(Path(directory).glob("*/"))) for directory in args.input_dir)
-        )
+        colorprint(Style.BRIGHT + Fore.MAGENTA, "\n--- JOB COMPLETED!!! ---\n")
+
+    # Querying the server index.
+    elif args.query is True:
+        from tstodlc.tools.query import run_query
 
-        if total == 0:
+        if args.output == "table":
             colorprint(
-                Style.BRIGHT + Fore.RED,
-                "-> Warning! No subdirectories found under the arguments you have provided.",
+                Style.BRIGHT + Fore.MAGENTA,
+                "\n\n--- QUERYING SERVER DLCIndex ---\n\n",
             )
-            colorprint(
-                Style.BRIGHT + Fore.YELLOW,
-                """
-                \r-  Remember that you should specify your DLC directories.
-                \r-  That means that each DLC should be a directory.
+        run_query(Path(args.dlc_dir), args.where, args.since, args.output)
 
-                \r-  Within each DLC (each directory) there should be subdirectories
-                \r-  corresponding to DLC components.
+        if args.output == "table":
+            colorprint(Style.BRIGHT + Fore.MAGENTA, "\n--- JOB COMPLETED!!! ---\n")
 
-                \r-  Within these subdirectories there should be the files corresponding to
-                \r-  that DLC component.
-                """,
-            )
-            colorprint(
-                Style.BRIGHT + Fore.CYAN,
-                "-> An example is given bellow with a DLC that is named 'SuperSecretUpdate'.\n",
-            )
-            colorprint(
-                Style.BRIGHT + Fore.WHITE,
-                "$  tstodlc SuperSecretUpdate/ /path/to/server/dlc/\n",
-            )
-            colorprint(
-                Style.BRIGHT + Fore.CYAN,
-                "** The contents of the ilustrated SuperSecretUpdate directory are shown bellow.\n",
-            )
-            colorprint(Style.BRIGHT + Fore.WHITE, "\t - SuperSecretUpdate/", "")
-            colorprint(Style.BRIGHT + Fore.WHITE, "\t\t - textpools-pt/", "")
-            colorprint(Style.BRIGHT + Fore.WHITE, "\t\t - textpools-en/", "")
-            colorprint(Style.BRIGHT + Fore.WHITE, "\t\t - buildings/", "")
-            colorprint(Style.BRIGHT + Fore.WHITE, "\t\t - decorations/", "")
-            colorprint(Style.BRIGHT + Fore.WHITE, "\t\t - buildings-menu/", "")
-            colorprint(Style.BRIGHT + Fore.WHITE, "\t\t - decorations-menu/", "\n\n")
-            return
-
-        # Set destination of DLC files.
-        target_dir = Path(args.dlc_dir)
-        target_dir.mkdir(exist_ok=True)
-
-        # Start looking at each subpackage.
-        for directory in directories:
-            if directory.is_dir() is False:
-                report_progress(
-                    progress_str(
-                        n,
-                        total,
-                        Style.BRIGHT
-                        + Fore.RED
-                        + "Warning! "
-                        + f"{directory}"
-                        + Style.RESET_ALL
-                        + Style.BRIGHT
-                        + Fore.RED
-                        + " is not a directory.\n"
-                        + Style.RESET_ALL,
-                    ),
-                    "",
-                )
-                continue
-
-            # Subdirectory in DLC.
-            subtarget_dir = (
-                Path(target_dir, directory.name)
-                if args.nozip is False
-                else Path(target_dir)
-            )
-            subtarget_dir.mkdir(parents=True, exist_ok=True)
+    # Collecting unreferenced archives.
+    elif args.gc is True:
+        from tstodlc.tools.index import CollectGarbage
+        from tstodlc.tools.revisions import get_retained_files
+
+        colorprint(
+            Style.BRIGHT + Fore.MAGENTA,
+            "\n\n--- COLLECTING UNREFERENCED ARCHIVES FROM SERVER DLC REPOSITORY ---\n\n",
+        )
+        CollectGarbage(
+            Path(args.dlc_dir),
+            args.keep,
+            args.dry_run,
+            get_retained_files(Path(args.dlc_dir)),
+            args.gc_nozip,
+        )
+
+        colorprint(Style.BRIGHT + Fore.MAGENTA, "\n--- JOB COMPLETED!!! ---\n")
+
+    # Rolling back to previous revisions.
+    elif args.rollback is True:
+        from tstodlc.tools.revisions import rollback_packages
+
+        colorprint(
+            Style.BRIGHT + Fore.MAGENTA,
+            "\n\n--- ROLLING BACK PACKAGES OF SERVER DLC REPOSITORY ---\n\n",
+        )
+        rollback_packages(Path(args.dlc_dir), directories, args.to, args.component)
+
+        colorprint(Style.BRIGHT + Fore.MAGENTA, "\n--- JOB COMPLETED!!! ---\n")
+
+    # Repacking installed packages.
+    elif args.repack is True:
+        from tstodlc.tools.repack import repack_packages
+
+        colorprint(
+            Style.BRIGHT + Fore.MAGENTA,
+            "\n\n--- REPACKING PACKAGES FROM SERVER DLC REPOSITORY ---\n\n",
+        )
+        repack_packages(Path(args.dlc_dir), directories, args)
+
+        colorprint(Style.BRIGHT + Fore.MAGENTA, "\n--- JOB COMPLETED!!! ---\n")
+
+    # Unpacking installed packages.
+    elif args.unpack is True:
+        from tstodlc.tools.unpack import unpack_packages
+
+        colorprint(
+            Style.BRIGHT + Fore.MAGENTA,
+            "\n\n--- UNPACKING PACKAGES FROM SERVER DLC REPOSITORY ---\n\n",
+        )
+        unpack_packages(Path(args.dlc_dir), directories, args.jobs)
+
+        colorprint(Style.BRIGHT + Fore.MAGENTA, "\n--- JOB COMPLETED!!! ---\n")
 
+    # Checking DLC components.
+    elif args.check is True:
+        from tstodlc.tools.build import scan_component
+        from tstodlc.tools.validate import validate_components
+
+        colorprint(
+            Style.BRIGHT + Fore.MAGENTA,
+            "\n\n--- CHECKING DLC COMPONENTS ---\n\n",
+        )
+        validate_components(
+            [
+                (subdirectory, scan_component(subdirectory))
+                for directory in directories
+                if directory.is_dir() is True
+                for subdirectory in sorted(directory.glob("*"))
+                if subdirectory.is_dir() is True
+            ],
+            args,
+        )
+
+        colorprint(Style.BRIGHT + Fore.MAGENTA, "\n--- JOB COMPLETED!!! ---\n")
+
+    # Finding files shipped more than once.
+    elif args.duplicates is True:
+        from tstodlc.tools.cache import report_duplicates
+
+        colorprint(
+            Style.BRIGHT + Fore.MAGENTA,
+            "\n\n--- FINDING DUPLICATED FILES IN DLC COMPONENTS ---\n\n",
+        )
+        report_duplicates(
+            [directory for directory in directories if directory.is_dir() is True],
+            args.jobs,
+        )
+
+        colorprint(Style.BRIGHT + Fore.MAGENTA, "\n--- JOB COMPLETED!!! ---\n")
+
+    # Planning a normal operation.
+    elif args.plan is not None:
+        from tstodlc.tools.plan import make_plan, split_plan, write_plan
+
+        if args.plan != "-":
             colorprint(
-                Style.BRIGHT + Fore.LIGHTBLUE_EX,
-                f"-> Archive - {subtarget_dir.relative_to(subtarget_dir.parent.parent)}:",
+                Style.BRIGHT + Fore.MAGENTA,
+                "\n\n--- PLANNING DLC INSTALLATION ---\n\n",
             )
 
-            # Start of DLCIndex file.
-            dlc_index_file = Path(directory, f"DLCIndex-{subtarget_dir.name}.xml")
-            force_install = not dlc_index_file.exists()
-
-            # Get tree.
-            tree = GetIndexTree(dlc_index_file, "DlcIndex")
-            root = tree.getroot()
-            root_list = [root]
-
-            # Get revision status.
-            revision_status = bool(
-                int(
-                    root_list[0].attrib.get(
-                        "revision", "0" if args.norevision is True else "1"
-                    )
-                )
-            )
-            root_list[0].set("revision", "0" if args.norevision is True else "1")
-
-            # Create InitialPackages tag.
-            if root.find("InitialPackages") is not None:
-                root_list.append(root.find("InitialPackages"))
-            elif args.initial is True:
-                root_list.append(ET.SubElement(root, "InitialPackages"))
-                force_install = True
-
-            # Create TutorialPackages tag.
-            if root.find("TutorialPackages") is not None:
-                root_list.append(root.find("TutorialPackages"))
-            elif args.tutorial is True:
-                root_list.append(ET.SubElement(root, "TutorialPackages"))
-                force_install = True
-
-            # Remove all local entries if their subfolders do not exist anymore!
-            for branch in root_list:
-                for pkg in branch.findall("Package"):
-                    filepath = Path(
-                        GetSubElementAttributes(pkg, "FileName")
-                        .get("val", None)
-                        .replace(":", os.sep)
-                    )
-                    filenamesplit = filepath.stem.rsplit("-r", maxsplit=1)
-                    filepath = Path(
-                        directory,
-                        filenamesplit[0]
-                        if filenamesplit[-1].isdigit()
-                        else filepath.stem,
-                    )
-                    # Remove package if subfolder does not exist or if it is empty.
-                    if filepath.exists() is False or len(list(filepath.iterdir())) == 0:
-                        branch.remove(pkg)
-
-            # Start the packaging operation.
-            if args.index_only is False:
-                for subdirectory in (
-                    subdirectory
-                    for subdirectory in directory.glob("*")
-                    if subdirectory.is_dir() is True
-                ):
-                    # Get first subpath it can find and filename.
-                    subpath = list(
-                        subtarget_dir.glob(
-                            f"{subdirectory.name}.{'' if args.nozip is True else '.zip'}"
-                        )
-                    ) + list(
-                        subtarget_dir.glob(
-                            f"{subdirectory.name}-r*{'' if args.nozip is True else '.zip'}"
-                        )
-                    )
-                    if len(subpath) > 0:
-                        subpath = subpath[0]
-                    else:
-                        subpath = Path(
-                            subtarget_dir,
-                            subdirectory.name + ("" if args.nozip is True else ".zip"),
-                        )
-
-                    filename = str(subpath.relative_to(subpath.parent.parent))
-
-                    # Only install subdirectory if it has changed or --priority has been set.
-                    # Also, force install if --initial or --tutorial are set for the first time.
-                    # Also, force install if --nozip or revision_status is opposite of current revision option.
-                    if (
-                        force_install is False
-                        and args.nozip is False
-                        and revision_status == (not args.norevision)
-                        and subpath.exists() is True
-                        and args.priority is None
-                        and subdirectory.stat().st_mtime_ns < subpath.stat().st_mtime_ns
-                    ):
-                        n += 1
-                        report_progress(
-                            progress_str(
-                                n,
-                                total,
-                                Style.BRIGHT
-                                + Fore.WHITE
-                                + f"- {subdirectory.name} has not changed since last time!\n"
-                                + Style.RESET_ALL,
-                            ),
-                            "",
-                        )
-
-                        # Update index options.
-                        if args.nozip is False:
-                            for root in root_list:
-                                UpdatePackageEntry(
-                                    root_list[0],
-                                    root,
-                                    args.platform,
-                                    args.unzip,
-                                    args.version,
-                                    args.tier,
-                                    None,
-                                    None,
-                                    None,
-                                    filename,
-                                    filename,
-                                    args.language,
-                                )
-
-                        continue
-
-                    # Get revision number to create a new revision and replace the previous one.
-                    if args.norevision is False:
-                        newsubpath = Path(
-                            subtarget_dir,
-                            subdirectory.name
-                            + f"-r{epoch_time_sec}"
-                            + ("" if args.nozip is True else ".zip"),
-                        )
-
-                    else:
-                        newsubpath = Path(
-                            subtarget_dir,
-                            subdirectory.name + ("" if args.nozip is True else ".zip"),
-                        )
-
-                    newfilename = str(newsubpath.relative_to(newsubpath.parent.parent))
-
-                    # Remove old zip file with previous revision.
-                    if args.nozip is False and subpath.exists() is True:
-                        os.remove(subpath)
-
-                    with tempfile.TemporaryDirectory() as tempdir:
-                        # Main files.
-                        file_0 = Path(tempdir, "0")
-                        file_1 = Path(tempdir, "1")
-
-                        # Get files in current directory.
-                        files = [i for i in subdirectory.glob("**/*")]
-
-                        # No files at all. Do nothing!
-                        if len(files) == 0:
-                            colorprint(
-                                Style.BRIGHT + Fore.RED,
-                                f"Warning! No files found at {subdirectory}. Skipping to next subdirectory!",
-                            )
-                            continue
-
-                        # Zip all files into file_1.
-                        with ZipFile(
-                            file_1, "w", ZIP_DEFLATED, strict_timestamps=False
-                        ) as ZObject:
-                            for file in files:
-                                ZObject.write(file, arcname=file.relative_to(subdirectory))
-
-                        with open(file_0, "wb") as f0:
-                            # Write 0 file signature.
-                            f0.write(b"\x42\x47\x72\x6d\x03\x02")
-
-                            # Reserve 4 bytes for 0 file size.
-                            # Fill it up later.
-                            f0.write(b"\x00\x00\x00\x00")
-
-                            # Biggest amount of allocated bytes.
-                            longest_filename = sorted(
-                                [file.name for file in files], key=len, reverse=True
-                            )[0]
-                            longest_length = (
-                                len(longest_filename) * 2
-                                + len(Path(longest_filename).suffix[1:])
-                                + 14
-                            )
-                            f0.write(longest_length.to_bytes(length=2))
-
-                            f0.write(b"\x00")
-
-                            # Full filepath.
-                            write_str_to_file(f0, str(subdirectory.name) + "/1")
-
-                            # Number of zipped files and allocated space for filename and crc32.
-                            f0.write(b"\x00\x01\x00\x08")
-
-                            # 1 filename.
-                            write_str_to_file(f0, file_1.stem)
-
-                            # Unknown but doesn't seem to change between files.
-                            f0.write(b"\x01")
-
-                            # File 1 crc32.
-                            with open(file_1, "rb") as f1:
-                                f0.write(
-                                    (zlib.crc32(f1.read()) & 0xFFFFFFFF).to_bytes(
-                                        length=4
-                                    )
-                                )
-
-                            # Number of files.
-                            f0.write(len(files).to_bytes(length=2))
-
-                            for file in files:
-                                # File skip.
-                                skip = 2 * len(file.name) + len(file.suffix[1:]) + 14
-                                f0.write(skip.to_bytes(length=2))
-
-                                # Filename, extension, internal filename, file size.
-                                write_str_to_file(f0, file.name)
-                                write_str_to_file(f0, file.suffix[1:])
-                                write_str_to_file(f0, file.name)
-                                file_size = file.stat().st_size
-                                f0.write(file_size.to_bytes(length=4))
-
-                                # Priority value or build number value.
-                                # If two files define the same filenames, the file with the bigger value associated
-                                # with it within 0 file will take precedence on usage by the game.
-                                # Audios, textpools, gamescripts and non graphical elements usually utilizes 0x0001.
-                                priority = (
-                                    int(root_list[0].attrib.get("priority", "1"))
-                                    if args.priority is None
-                                    else args.priority
-                                )
-                                f0.write(priority.to_bytes(length=2))
-                                root_list[0].set("priority", str(priority))
-
-                                # Unknown but doesn't seem to change between files.
-                                f0.write(b"\x00\x00")
-
-                            # Write 0 file size.
-                            f0_size = f0.tell() + 4
-                            f0.seek(6)
-                            f0.write(f0_size.to_bytes(length=4))
-
-                        # Partial file 0 crc32.
-                        with open(file_0, "rb+") as f0:
-                            file_0_crc32 = zlib.crc32(f0.read()) & 0xFFFFFFFF
-                            f0.write(file_0_crc32.to_bytes(length=4))
-
-                        files = [i for i in Path(tempdir).glob("*") if not i.is_dir()]
-                        if args.nozip is True:
-                            pkg_dir = Path(subtarget_dir, subdirectory.name)
-                            pkg_dir.mkdir(exist_ok=True)
-
-                            for file in files:
-                                shutil.copy(file, pkg_dir)
-
-                            # Added file.
-                            n += 1
-
-                            report_progress(
-                                progress_str(
-                                    n,
-                                    total,
-                                    Style.BRIGHT
-                                    + Fore.YELLOW
-                                    + f"- Added directory: {subdirectory.name if args.nozip is True else subdirectory}\n"
-                                    + Style.RESET_ALL,
-                                ),
-                                "",
-                            )
-                            pass
-                        else:
-                            zip_file = newsubpath
-                            with ZipFile(
-                                zip_file, "w", ZIP_DEFLATED, strict_timestamps=False
-                            ) as ZObject:
-                                for file in files:
-                                    ZObject.write(file, arcname=file.name)
-
-                            # Complete file 0 crc32.
-                            with open(file_0, "rb") as f0:
-                                file_0_crc32 = zlib.crc32(f0.read()) & 0xFFFFFFFF
-
-                            # Add/Update Package in DLCIndex.xml.
-                            for root in root_list:
-                                UpdatePackageEntry(
-                                    root_list[0],
-                                    root,
-                                    args.platform,
-                                    args.unzip,
-                                    args.version,
-                                    args.tier,
-                                    str(zip_file.stat().st_size // 1000),
-                                    str(file_1.stat().st_size // 1000),
-                                    str(file_0_crc32),
-                                    filename,
-                                    newfilename,
-                                    args.language,
-                                )
-
-                            # Added file.
-                            n += 1
-
-                            report_progress(
-                                progress_str(
-                                    n,
-                                    total,
-                                    Style.BRIGHT
-                                    + Fore.YELLOW
-                                    + f"- Added file: {newsubpath.relative_to(newsubpath.parent.parent)}\n"
-                                    + Style.RESET_ALL,
-                                ),
-                                "",
-                            )
-
-                colorprint(
-                    Style.BRIGHT + Fore.GREEN,
-                    f"\n\n-> Sucessfully installed files listed above in {subtarget_dir.relative_to(subtarget_dir.parent.parent)}!",
-                )
-
-            if args.nozip is False:
-                # Write local tree.
-                ET.indent(tree, "  ")
-                with open(
-                    Path(dlc_index_file.parent, dlc_index_file.stem + ".xml"), "wb"
-                ) as xml_file:
-                    tree.write(xml_file)
-
-                # Update server tree if possible.
-                update_status, server_index = UpdateServerIndex(
-                    dlc_index_file,
-                    Path(args.dlc_dir, "dlc"),
-                    [
-                        subdirectory.relative_to(directory.parent)
-                        for subdirectory in directory.glob("*")
-                        if subdirectory.is_dir() is True
-                    ],
-                    [root.tag for root in root_list],
-                )
-                if update_status is True:
-                    colorprint(
-                        Style.BRIGHT + Fore.GREEN, f"-> Updated: {server_index}!"
-                    )
+        plan = make_plan(directories, Path(args.dlc_dir), args)
+        if args.split is not None:
+            split_plan(plan, args.split)
+        write_plan(plan, args.plan)
+
+        if args.plan != "-":
+            colorprint(Style.BRIGHT + Fore.MAGENTA, "\n--- JOB COMPLETED!!! ---\n")
+
+    # Building the components of a node.
+    elif args.work is not None:
+        from tstodlc.tools.distribute import run_node
+        from tstodlc.tools.cache import get_cache_dir
+
+        colorprint(
+            Style.BRIGHT + Fore.MAGENTA,
+            f"\n\n--- PACKING FILES OF NODE {args.node} INTO 0 and 1 FILES ---\n\n",
+        )
+        run_node(
+            Path(args.work),
+            args.node,
+            Path(args.dlc_dir),
+            args.manifest,
+            get_cache_dir(args),
+            args.cache_size,
+        )
+
+        colorprint(Style.BRIGHT + Fore.MAGENTA, "\n--- JOB COMPLETED!!! ---\n")
+
+    # Merging the results of all nodes.
+    elif args.merge is not None:
+        from tstodlc.tools.distribute import merge_manifests
+
+        colorprint(
+            Style.BRIGHT + Fore.MAGENTA,
+            "\n\n--- MERGING RESULTS INTO DLCIndex FILES ---\n\n",
+        )
+        merge_manifests([Path(item) for item in args.merge], Path(args.dlc_dir))
 
         colorprint(Style.BRIGHT + Fore.MAGENTA, "\n--- JOB COMPLETED!!! ---\n")
+
+    # Normal operation.
+    else:
+        from tstodlc.tools.install import install
+
+        install(directories, args, epoch_time_sec)
@@ -0,0 +1,154 @@
+import json
+import sys
+import time
+from pathlib import Path
+from colorama import Fore, Style
+from tstodlc.tools.build import (
+    get_rebuild_reason,
+    get_source_size,
+    index_packages,
+    load_local_index,
+)
+from tstodlc.tools.history import estimate_seconds, get_throughput, load_history
+from tstodlc.tools.progress import colorprint
+
+
+# Arguments that change how packages are built. They travel with the plan so every node builds alike.
+BUILD_OPTIONS = [
+    "platform",
+    "unzip",
+    "version",
+    "tier",
+    "language",
+    "initial",
+    "tutorial",
+    "priority",
+    "norevision",
+    "nozip",
+    "shard",
+    "shard_size",
+    "compression",
+    "outer_compression",
+    "compress_level",
+    "keep_revisions",
+]
+
+
+def make_plan(directories, target_dir, args):
+    # Decide what a normal run would do without writing anything.
+    history = load_history(target_dir if args.nozip is False else None)
+    throughput = get_throughput(history)
+
+    components = []
+    for directory in directories:
+        if directory.is_dir() is False:
+            continue
+
+        subtarget_dir = (
+            Path(target_dir, directory.name) if args.nozip is False else Path(target_dir)
+        )
+        _, _, _, revision_status, force_install = load_local_index(
+            directory, subtarget_dir, args
+        )
+        installed = (
+            index_packages(subtarget_dir, args.nozip)
+            if subtarget_dir.is_dir() is True
+            else dict()
+        )
+
+        for subdirectory in sorted(
+            subdirectory for subdirectory in directory.glob("*") if subdirectory.is_dir()
+        ):
+            if args.index_only is True:
+                reason = None
+            else:
+                reason = get_rebuild_reason(
+                    subdirectory,
+                    installed.get(subdirectory.name, dict()),
+                    force_install,
+                    revision_status,
+                    args,
+                )
+            count, size = get_source_size(subdirectory)
+            components.append(
+                {
+                    "directory": str(directory),
+                    "component": subdirectory.name,
+                    "action": "skip" if reason is None else "rebuild",
+                    "reason": "not changed" if reason is None else reason,
+                    "files": count,
+                    "bytes": size,
+                    "estimate": 0
+                    if reason is None
+                    else estimate_seconds(history, subdirectory, size, throughput),
+                    "node": None if reason is None else 1,
+                }
+            )
+
+    rebuild = [component for component in components if component["action"] == "rebuild"]
+    return {
+        "created": round(time.time()),
+        "options": {option: getattr(args, option) for option in BUILD_OPTIONS},
+        "nodes": 1,
+        "throughput": throughput,
+        "rebuild": len(rebuild),
+        "skip": len(components) - len(rebuild),
+        "bytes": sum(component["bytes"] for component in rebuild),
+        "estimate": sum(component["estimate"] for component in rebuild)
+        if all(component["estimate"] is not None for component in rebuild)
+        else None,
+        "components": components,
+    }
+
+
+def split_plan(plan, nodes):
+    # Hand out components to nodes, longest first, always to the node with the least work so far.
+    loads = [0] * nodes
+    rebuild = [component for component in plan["components"] if component["action"] == "rebuild"]
+    if any(component["estimate"] is None for component in rebuild):
+        costs = [component["bytes"] for component in rebuild]
+    else:
+        costs = [component["estimate"] for component in rebuild]
+    for cost, component in sorted(
+        zip(costs, rebuild), key=lambda item: item[0], reverse=True
+    ):
+        node = loads.index(min(loads))
+        loads[node] += cost
+        component["node"] = node + 1
+    plan["nodes"] = nodes
+    return plan
+
+
+def write_plan(plan, plan_file):
+    if plan_file == "-":
+        json.dump(plan, sys.stdout, indent=2)
+        print()
+        return
+
+    with open(plan_file, "w") as f:
+        json.dump(plan, f, indent=2)
+
+    for component in plan["components"]:
+        colorprint(
+            Style.BRIGHT + (Fore.YELLOW if component["action"] == "rebuild" else Fore.WHITE),
+            f"- {component['component']}: {component['action']} ({component['reason']}), {component['bytes']} bytes",
+            "",
+        )
+    if plan["nodes"] > 1:
+        for node in range(1, plan["nodes"] + 1):
+            components = [component for component in plan["components"] if component["node"] == node]
+            colorprint(
+                Style.BRIGHT + Fore.CYAN,
+                f"* Node {node}: {len(components)} components with {sum(component['bytes'] for component in components)} bytes",
+                "",
+            )
+
+    colorprint(
+        Style.BRIGHT + Fore.GREEN,
+        f"\n-> {plan['rebuild']} components to rebuild with {plan['bytes']} bytes"
+        + (
+            f", estimated in {plan['estimate']:.1f} seconds!"
+            if plan["estimate"] is not None
+            else ". There is no history for estimating time yet!"
+        ),
+    )
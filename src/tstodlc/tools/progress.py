@@ -1,11 +1,19 @@
 from colorama import Style, Fore
 
-def progress_str(n, total, message):
+def eta_str(seconds):
+    minutes, seconds = divmod(round(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}"
+
+
+def progress_str(n, total, message, eta=None):
+    # n and total can be counts or any other measure of work, such as estimated seconds.
     return (
         message
         + Style.BRIGHT
         + Fore.CYAN
-        + f"- Progress ({n * 100 / total:.2f}%)"
+        + f"- Progress ({n * 100 / total if total > 0 else 100:.2f}%)"
+        + (f" - ETA {eta_str(eta)}" if eta is not None else "")
         + Style.RESET_ALL
     )
 
@@ -20,3 +28,19 @@ def report_progress(prefix_str, parsing_info):
 def colorprint(style, message, end="\n"):
     print(style + message, end=end)
     print(Style.RESET_ALL)
+
+
+def report_reads(results):
+    # Bytes read while packing the components of the given results and how long it took.
+    size = sum(result.get("read_bytes", 0) for result in results)
+    read_seconds = sum(result.get("read_seconds", 0) for result in results)
+    wait_seconds = sum(result.get("wait_seconds", 0) for result in results)
+    seconds = sum(result.get("seconds", 0) for result in results)
+    if size == 0:
+        return
+    colorprint(
+        Style.BRIGHT + Fore.CYAN,
+        f"* {size / 1000000:.1f} MB read"
+        + (f" at {size / read_seconds / 1000000:.1f} MB/s" if read_seconds > 0 else "")
+        + f", {wait_seconds:.1f} of {seconds:.1f} seconds spent waiting for reads.",
+    )
@@ -0,0 +1,162 @@
+import json
+import os
+import sys
+from bisect import bisect_left
+from pathlib import Path
+from colorama import Fore, Style
+from tstodlc.tools.index import GetServerIndexTree, GetSubElementAttributes, SplitRevision
+from tstodlc.tools.progress import colorprint
+
+
+# Package attributes that can be used to filter queries. Each one gets its own index.
+QUERY_KEYS = ["branch", "dlc", "language", "tier", "platform", "minVersion"]
+
+
+def get_size(pkg, subelement):
+    # Sizes are kept in kilobytes. Entries waiting to be reinstalled do not have them.
+    value = GetSubElementAttributes(pkg, subelement).get("val", "")
+    return int(value) if value.isdigit() is True else None
+
+
+def get_package_record(pkg, branch):
+    filename = GetSubElementAttributes(pkg, "FileName").get("val", "")
+    path = Path(filename.replace(":", os.sep))
+    return {
+        "branch": branch,
+        "filename": filename,
+        "dlc": path.parent.name,
+        "package": SplitRevision(path.stem)[0],
+        "revision": SplitRevision(path.stem)[1],
+        "language": GetSubElementAttributes(pkg, "Language").get("val", "all"),
+        "tier": pkg.attrib.get("tier", "all"),
+        "platform": pkg.attrib.get("platform", "all"),
+        "minVersion": pkg.attrib.get("minVersion", ""),
+        "filesize": get_size(pkg, "FileSize"),
+        "unc_filesize": get_size(pkg, "UncompressedFileSize"),
+    }
+
+
+def build_query_index(server_tree):
+    # Read every package of the server index once and index them by each query key and by revision.
+    root = server_tree.getroot()
+    packages = [
+        get_package_record(pkg, branch.tag)
+        for branch in [root]
+        + [root.find(tag) for tag in ["InitialPackages", "TutorialPackages"]]
+        if branch is not None
+        for pkg in branch.findall("Package")
+    ]
+
+    indexes = {key: dict() for key in QUERY_KEYS}
+    for i, package in enumerate(packages):
+        for key in QUERY_KEYS:
+            indexes[key].setdefault(package[key], set()).add(i)
+
+    revisions = sorted(
+        (package["revision"], i)
+        for i, package in enumerate(packages)
+        if package["revision"] is not None
+    )
+    return {"packages": packages, "indexes": indexes, "revisions": revisions}
+
+
+def load_query_index(dlc_root):
+    # Query index of the server DLC repository, or None if there is no server index.
+    server_index, server_tree = GetServerIndexTree(Path(dlc_root, "dlc"), "DlcIndex")
+    if server_index is None or server_tree is None:
+        return None
+    return build_query_index(server_tree)
+
+
+def query_packages(query_index, where=None, since=None):
+    # Packages matching every key=value of where and revised after since.
+    # Only the smallest set of candidates is walked, the others are looked up.
+    candidates = []
+    for key, value in (where or dict()).items():
+        if key not in QUERY_KEYS:
+            raise KeyError(key)
+        candidates.append(query_index["indexes"][key].get(value, set()))
+
+    packages = query_index["packages"]
+    if len(candidates) > 0:
+        candidates.sort(key=len)
+        ids = sorted(
+            i for i in candidates[0] if all(i in other for other in candidates[1:])
+        )
+        if since is not None:
+            ids = [
+                i
+                for i in ids
+                if packages[i]["revision"] is not None and packages[i]["revision"] > since
+            ]
+    elif since is not None:
+        revisions = query_index["revisions"]
+        ids = [i for _, i in revisions[bisect_left(revisions, (since + 1, -1)) :]]
+    else:
+        ids = range(len(packages))
+
+    return [packages[i] for i in ids]
+
+
+def summarize_packages(packages):
+    return {
+        "count": len(packages),
+        "filesize": sum(package["filesize"] or 0 for package in packages),
+        "unc_filesize": sum(package["unc_filesize"] or 0 for package in packages),
+    }
+
+
+def parse_where(conditions):
+    where = dict()
+    for condition in conditions or []:
+        key, separator, value = condition.partition("=")
+        if separator == "" or key not in QUERY_KEYS:
+            raise ValueError(condition)
+        where[key] = value
+    return where
+
+
+def run_query(dlc_root, conditions=None, since=None, output="table"):
+    try:
+        where = parse_where(conditions)
+    except ValueError as error:
+        colorprint(
+            Style.BRIGHT + Fore.RED,
+            f"-> Invalid condition {error}. Use key=value with key being one of: {', '.join(QUERY_KEYS)}.",
+        )
+        return
+
+    query_index = load_query_index(dlc_root)
+    if query_index is None:
+        colorprint(Style.BRIGHT + Fore.RED, "-> Server DLCIndex was not found!")
+        return
+
+    packages = query_packages(query_index, where, since)
+    summary = summarize_packages(packages)
+
+    if output == "json":
+        json.dump(dict(summary, packages=packages), sys.stdout, indent=2)
+        print()
+        return
+
+    colorprint(Fore.LIGHTWHITE_EX, "-" * 116, "")
+    colorprint(
+        Fore.WHITE,
+        f"{'BRANCH':<18s}{'FILENAME':<48s}{'TIER':<8s}{'LANGUAGE':<10s}{'PLATFORM':<10s}{'VERSION':<10s}{'SIZE':>12s}",
+        "",
+    )
+    colorprint(Fore.LIGHTWHITE_EX, "-" * 116, "")
+    for package in packages:
+        colorprint(
+            Fore.WHITE,
+            f"{package['branch']:<18s}{package['filename']:<48s}{package['tier']:<8s}{package['language']:<10s}"
+            + f"{package['platform']:<10s}{package['minVersion']:<10s}"
+            + f"{str(package['filesize']) if package['filesize'] is not None else '-':>12s}",
+            "",
+        )
+    colorprint(Fore.LIGHTWHITE_EX, "-" * 116, "")
+
+    colorprint(
+        Style.BRIGHT + Fore.GREEN,
+        f"-> {summary['count']} packages with {summary['filesize']} KB ({summary['unc_filesize']} KB uncompressed)!",
+    )
@@ -0,0 +1,227 @@
+import struct
+import zlib
+from zipfile import ZIP_DEFLATED
+
+
+# Zip records written by RawZipWriter. Zip64 extensions are not needed, since
+# the 0 file keeps the size of file 1 and of every archived file within 4 bytes.
+LOCAL_HEADER = struct.Struct("<IHHHHHIIIHH")
+CENTRAL_HEADER = struct.Struct("<IHHHHHHIIIHHHHHII")
+END_RECORD = struct.Struct("<IHHHHIIH")
+
+LOCAL_HEADER_SIGNATURE = 0x04034B50
+CENTRAL_HEADER_SIGNATURE = 0x02014B50
+END_RECORD_SIGNATURE = 0x06054B50
+
+# Zip 2.0 is needed to extract members. They are made by unix, since external
+# attributes hold unix modes as zipfile writes them.
+VERSION_NEEDED = 20
+VERSION_MADE_BY = (3 << 8) | VERSION_NEEDED
+
+# Bytes read at once when copying or compressing members.
+CHUNK_SIZE = 1 << 20
+
+# Only the utf8 flag is kept from the members that are copied.
+FLAG_UTF8 = 0x800
+
+ZIP_LIMIT = 0xFFFFFFFF
+
+
+def dos_date_time(date_time):
+    # Dates the format can not hold are clamped, as zipfile does without strict timestamps.
+    if date_time[0] < 1980:
+        date_time = (1980, 1, 1, 0, 0, 0)
+    elif date_time[0] > 2107:
+        date_time = (2107, 12, 31, 23, 59, 59)
+    year, month, day, hour, minute, second = date_time
+    return (
+        (hour << 11) | (minute << 5) | (second // 2),
+        ((year - 1980) << 9) | (month << 5) | day,
+    )
+
+
+def get_data_offset(f, zinfo):
+    # Compressed data of a member starts right after its local header, which might differ from the central one.
+    f.seek(zinfo.header_offset)
+    fields = LOCAL_HEADER.unpack(f.read(LOCAL_HEADER.size))
+    if fields[0] != LOCAL_HEADER_SIGNATURE:
+        raise ValueError(f"Bad local header for {zinfo.filename}.")
+    return zinfo.header_offset + LOCAL_HEADER.size + fields[9] + fields[10]
+
+
+def can_copy_raw(zinfo, compression):
+    # Encrypted members and members compressed with another method have to go through zipfile.
+    return zinfo.compress_type == compression and zinfo.flag_bits & 0x1 == 0
+
+
+class RawZipWriter:
+    # Write a zip archive from members of another archive without decompressing them,
+    # or from streams that are compressed on the way.
+    def __init__(self, f):
+        self.f = f
+        self.entries = []
+
+    def _write_header(self, name, flags, compression, date_time, crc, compress_size, file_size):
+        if len(self.entries) >= 0xFFFF or self.f.tell() > ZIP_LIMIT:
+            raise ValueError(f"{name} does not fit without zip64 extensions.")
+
+        encoded_name = name.encode()
+        if encoded_name != name.encode("ascii", "ignore"):
+            flags |= FLAG_UTF8
+        dos_time, dos_date = dos_date_time(date_time)
+        entry = {
+            "name": encoded_name,
+            "flags": flags,
+            "compression": compression,
+            "time": dos_time,
+            "date": dos_date,
+            "crc": crc,
+            "compress_size": compress_size,
+            "file_size": file_size,
+            "external_attr": 0,
+            "offset": self.f.tell(),
+        }
+        self.f.write(
+            LOCAL_HEADER.pack(
+                LOCAL_HEADER_SIGNATURE,
+                VERSION_NEEDED,
+                flags,
+                compression,
+                dos_time,
+                dos_date,
+                crc,
+                compress_size,
+                file_size,
+                len(encoded_name),
+                0,
+            )
+        )
+        self.f.write(encoded_name)
+        self.entries.append(entry)
+        return entry
+
+    def copy(self, src, zinfo):
+        # Copy the compressed data of a member as it is.
+        src.seek(get_data_offset(src, zinfo))
+        self.splice(
+            zinfo.filename,
+            src,
+            zinfo.date_time,
+            zinfo.compress_type,
+            zinfo.CRC,
+            zinfo.compress_size,
+            zinfo.file_size,
+            zinfo.external_attr,
+            zinfo.flag_bits & FLAG_UTF8,
+        )
+
+    def splice(self, name, src, date_time, compression, crc, compress_size, file_size, external_attr=0, flags=0):
+        # Add a member from data that is already compressed, read from the current position of src.
+        entry = self._write_header(
+            name, flags, compression, date_time, crc, compress_size, file_size
+        )
+        entry["external_attr"] = external_attr
+
+        remaining = compress_size
+        while remaining > 0:
+            chunk = src.read(min(CHUNK_SIZE, remaining))
+            if len(chunk) == 0:
+                raise EOFError(f"{name} is truncated.")
+            self.f.write(chunk)
+            remaining -= len(chunk)
+
+    def write(self, name, stream, date_time, compression=ZIP_DEFLATED, compress_level=None, external_attr=0, tee=None, digest=None):
+        # Compress a stream into a new member. Sizes and crc are filled in once it has been read.
+        # The compressed data is also written to tee if given, and the data read is fed to the digest if given.
+        # Returns crc and sizes of the member.
+        entry = self._write_header(name, 0, compression, date_time, 0, 0, 0)
+        entry["external_attr"] = external_attr
+        data_offset = self.f.tell()
+
+        compressor = (
+            zlib.compressobj(
+                zlib.Z_DEFAULT_COMPRESSION if compress_level is None else compress_level,
+                zlib.DEFLATED,
+                -15,
+            )
+            if compression == ZIP_DEFLATED
+            else None
+        )
+        crc = 0
+        file_size = 0
+        while True:
+            chunk = stream.read(CHUNK_SIZE)
+            if len(chunk) == 0:
+                break
+            crc = zlib.crc32(chunk, crc)
+            if digest is not None:
+                digest.update(chunk)
+            file_size += len(chunk)
+            self._write_data(compressor.compress(chunk) if compressor is not None else chunk, tee)
+        if compressor is not None:
+            self._write_data(compressor.flush(), tee)
+
+        end = self.f.tell()
+        if file_size > ZIP_LIMIT or end - data_offset > ZIP_LIMIT:
+            raise ValueError(f"{name} does not fit without zip64 extensions.")
+        entry["crc"] = crc
+        entry["compress_size"] = end - data_offset
+        entry["file_size"] = file_size
+        self.f.seek(entry["offset"] + 14)
+        self.f.write(struct.pack("<III", crc, entry["compress_size"], file_size))
+        self.f.seek(end)
+        return (crc, entry["compress_size"], file_size)
+
+    def _write_data(self, data, tee=None):
+        self.f.write(data)
+        if tee is not None:
+            tee.write(data)
+
+    def close(self):
+        # Central directory followed by the end record.
+        start = self.f.tell()
+        for entry in self.entries:
+            self.f.write(
+                CENTRAL_HEADER.pack(
+                    CENTRAL_HEADER_SIGNATURE,
+                    VERSION_MADE_BY,
+                    VERSION_NEEDED,
+                    entry["flags"],
+                    entry["compression"],
+                    entry["time"],
+                    entry["date"],
+                    entry["crc"],
+                    entry["compress_size"],
+                    entry["file_size"],
+                    len(entry["name"]),
+                    0,
+                    0,
+                    0,
+                    0,
+                    entry["external_attr"],
+                    entry["offset"],
+                )
+            )
+            self.f.write(entry["name"])
+        end = self.f.tell()
+        if end > ZIP_LIMIT:
+            raise ValueError("Archive does not fit without zip64 extensions.")
+        self.f.write(
+            END_RECORD.pack(
+                END_RECORD_SIGNATURE,
+                0,
+                0,
+                len(self.entries),
+                len(self.entries),
+                end - start,
+                start,
+                0,
+            )
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
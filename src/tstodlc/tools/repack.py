@@ -0,0 +1,233 @@
+import os
+import shutil
+import tempfile
+import time
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from io import BytesIO
+from pathlib import Path
+from zipfile import BadZipFile, ZipFile
+from colorama import Fore, Style
+from tstodlc.tools.build import COMPRESSION, write_local_index
+from tstodlc.tools.index import (
+    GetReferencedFiles,
+    GetServerIndexTree,
+    RepointPackages,
+    SplitRevision,
+    WriteServerTree,
+)
+from tstodlc.tools.progress import colorprint, progress_str, report_progress
+from tstodlc.tools.rawzip import RawZipWriter, can_copy_raw
+from tstodlc.tools.revisions import retain_revisions
+from tstodlc.tools.zerofile import get_crc32, read_0_file, write_0_entries
+
+
+def repack_package(dlc_root, filename, epoch_time_sec, options):
+    # Write a new revision of a package with other compression settings. Files within file 1 that
+    # are already compressed the right way are copied without being decompressed.
+    package = Path(dlc_root, filename)
+    result = {
+        "filename": filename,
+        "newfilename": filename,
+        "copied": 0,
+        "recompressed": 0,
+        "bytes": package.stat().st_size,
+        "newbytes": 0,
+        "issues": [],
+    }
+    compression = COMPRESSION[options["compression"]]
+
+    base, revision = SplitRevision(package.stem)
+    newpackage = Path(
+        package.parent,
+        (base + f"-r{epoch_time_sec}" if revision is not None else base) + ".zip",
+    )
+    zip_file = Path(package.parent, newpackage.name + ".tmp")
+
+    try:
+        with tempfile.TemporaryDirectory() as tempdir:
+            file_0 = Path(tempdir, "0")
+            file_1 = Path(tempdir, "1")
+            old_file_1 = Path(tempdir, "1.old")
+
+            with ZipFile(package) as ZObject:
+                if "0" not in ZObject.namelist() or "1" not in ZObject.namelist():
+                    result["issues"].append(f"{filename} is not a package.")
+                    return result
+                info = read_0_file(BytesIO(ZObject.read("0")))
+                with ZObject.open("1") as src, open(old_file_1, "wb") as dst:
+                    shutil.copyfileobj(src, dst, 1 << 20)
+
+            if info is None:
+                result["issues"].append(f"{filename} has an invalid 0 file.")
+                return result
+
+            # New file 1.
+            with (
+                open(old_file_1, "rb") as src,
+                ZipFile(src) as ZObject,
+                open(file_1, "wb") as dst,
+                RawZipWriter(dst) as writer,
+            ):
+                for zinfo in ZObject.infolist():
+                    if options["recompress"] is False and can_copy_raw(zinfo, compression):
+                        writer.copy(src, zinfo)
+                        result["copied"] += 1
+                    else:
+                        with ZObject.open(zinfo) as member:
+                            writer.write(
+                                zinfo.filename,
+                                member,
+                                zinfo.date_time,
+                                compression,
+                                options["compress_level"],
+                                zinfo.external_attr,
+                            )
+                        result["recompressed"] += 1
+
+            # New file 0, with the crc32 of the new file 1.
+            original_dir = info["original_dir"]
+            write_0_entries(
+                file_0,
+                file_1,
+                [
+                    (file["name"], file["size"], file["priority"])
+                    for file in info["archived_files"]
+                ],
+                original_dir[:-2] if original_dir.endswith("/1") else original_dir,
+            )
+
+            # The new revision is complete before it takes its place.
+            with ZipFile(
+                zip_file,
+                "w",
+                COMPRESSION[options["outer_compression"]],
+                compresslevel=options["compress_level"],
+                strict_timestamps=False,
+            ) as ZObject:
+                ZObject.write(file_0, arcname="0")
+                ZObject.write(file_1, arcname="1")
+            zip_file.replace(newpackage)
+
+            result["newfilename"] = str(newpackage.relative_to(dlc_root))
+            result["newbytes"] = newpackage.stat().st_size
+            result["filesize"] = str(newpackage.stat().st_size // 1000)
+            result["unc_filesize"] = str(file_1.stat().st_size // 1000)
+            result["crc"] = str(get_crc32(file_0))
+
+    except (OSError, BadZipFile, EOFError, ValueError) as error:
+        zip_file.unlink(missing_ok=True)
+        result["issues"].append(f"{filename} can not be repacked: {error}")
+
+    return result
+
+
+def report_repack(result, n, total):
+    if len(result["issues"]) > 0:
+        for issue in result["issues"]:
+            colorprint(Style.BRIGHT + Fore.RED, f"Warning! {issue}", "")
+        return
+
+    report_progress(
+        progress_str(
+            n,
+            total,
+            Style.BRIGHT
+            + Fore.YELLOW
+            + f"- Repacked {result['filename']} into {result['newfilename']}: "
+            + f"{result['copied']} copied, {result['recompressed']} compressed again\n"
+            + Style.RESET_ALL,
+        ),
+        "",
+    )
+
+
+def repack_packages(dlc_root, directories, args):
+    # Repack the packages of the given DLCs listed in the server index, then point the index files
+    # to the new revisions at once. Packages of other DLCs are left alone, since their local index
+    # files could not be updated and would point the server back to the previous revisions.
+    server_index, server_tree = GetServerIndexTree(Path(dlc_root, "dlc"), "DlcIndex")
+    if server_index is None or server_tree is None:
+        colorprint(Style.BRIGHT + Fore.RED, "-> Server DLCIndex was not found!")
+        return
+
+    names = {directory.name for directory in directories}
+    served = GetReferencedFiles(server_tree)
+    filenames = sorted(
+        str(path)
+        for path in served
+        if path.suffix == ".zip"
+        and path.parent.name in names
+        and Path(dlc_root, path).is_file() is True
+    )
+    options = {
+        "compression": args.compression,
+        "outer_compression": args.outer_compression,
+        "compress_level": args.compress_level,
+        "recompress": args.recompress,
+    }
+    epoch_time_sec = round(time.time())
+
+    results = []
+    if args.jobs > 1 and len(filenames) > 1:
+        with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+            futures = [
+                executor.submit(repack_package, dlc_root, filename, epoch_time_sec, options)
+                for filename in filenames
+            ]
+            for future in as_completed(futures):
+                results.append(future.result())
+                report_repack(results[-1], len(results), len(filenames))
+    else:
+        for filename in filenames:
+            results.append(repack_package(dlc_root, filename, epoch_time_sec, options))
+            report_repack(results[-1], len(results), len(filenames))
+
+    repacked = [result for result in results if len(result["issues"]) == 0]
+    updates = {
+        result["filename"].replace(os.sep, ":"): {
+            "FileName": result["newfilename"].replace(os.sep, ":"),
+            "FileSize": result["filesize"],
+            "UncompressedFileSize": result["unc_filesize"],
+            "IndexFileCRC": result["crc"],
+        }
+        for result in repacked
+    }
+
+    if len(updates) > 0:
+        RepointPackages(server_tree.getroot(), updates)
+        ET.indent(server_tree, "  ")
+        WriteServerTree(server_index, server_tree)
+        colorprint(Style.BRIGHT + Fore.GREEN, f"\n-> Updated: {server_index.name}!", "")
+
+        # Local index files of the given DLCs.
+        for directory in directories:
+            dlc_index_file = Path(directory, f"DLCIndex-{directory.name}.xml")
+            if dlc_index_file.exists() is True:
+                tree = ET.parse(dlc_index_file)
+                if RepointPackages(tree.getroot(), updates) > 0:
+                    write_local_index(dlc_index_file, tree)
+                    colorprint(
+                        Style.BRIGHT + Fore.GREEN, f"-> Updated: {dlc_index_file.name}!", ""
+                    )
+
+        # Previous revisions are only removed once the index files point to the new ones,
+        # or moved aside if revisions are kept for rollbacks.
+        if args.keep_revisions > 0:
+            served |= GetReferencedFiles(server_tree)
+            retain_revisions(
+                dlc_root, [{"issues": [], "packages": repacked}], args.keep_revisions, served
+            )
+        else:
+            for result in repacked:
+                if result["newfilename"] != result["filename"]:
+                    Path(dlc_root, result["filename"]).unlink(missing_ok=True)
+
+    colorprint(
+        Style.BRIGHT + Fore.GREEN,
+        f"\n-> {len(repacked)} packages repacked, "
+        + f"{sum(result['copied'] for result in repacked)} files copied and "
+        + f"{sum(result['recompressed'] for result in repacked)} compressed again. "
+        + f"{sum(result['bytes'] for result in repacked)} bytes before, "
+        + f"{sum(result['newbytes'] for result in repacked)} bytes after!",
+    )
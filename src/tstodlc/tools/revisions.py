@@ -0,0 +1,235 @@
+import json
+import os
+import xml.etree.ElementTree as ET
+import zlib
+from pathlib import Path
+from zipfile import BadZipFile, ZipFile
+from colorama import Fore, Style
+from tstodlc.tools.build import PACKAGE_NAME, write_local_index
+from tstodlc.tools.index import (
+    GetServerIndexTree,
+    GetSubElementAttributes,
+    RepointPackages,
+    SplitRevision,
+    WriteServerTree,
+)
+from tstodlc.tools.progress import colorprint
+
+
+# Revisions kept for rollbacks, listed within the server DLC repository.
+REVISIONS_FILE = Path(".tstodlc", "revisions.json")
+
+# Previous revisions are moved here, so only the live ones are left within each DLC directory.
+REVISIONS_DIR = Path(".tstodlc", "revisions")
+
+
+def load_revisions(dlc_root):
+    revisions_file = Path(dlc_root, REVISIONS_FILE)
+    if revisions_file.exists() is True:
+        with open(revisions_file, "r") as f:
+            return json.load(f)
+    else:
+        return {"packages": dict()}
+
+
+def save_revisions(dlc_root, revisions):
+    revisions_file = Path(dlc_root, REVISIONS_FILE)
+    revisions_file.parent.mkdir(exist_ok=True)
+    temp_file = revisions_file.with_suffix(f".{os.getpid()}.tmp")
+    with open(temp_file, "w") as f:
+        json.dump(revisions, f)
+    os.replace(temp_file, revisions_file)
+
+
+def get_package_key(filename):
+    # Packages are identified by their FileName without the revision.
+    path = Path(filename.replace(":", os.sep))
+    return f"{path.parent.name}:{SplitRevision(path.stem)[0]}"
+
+
+def get_revision(filename):
+    return SplitRevision(Path(filename.replace(":", os.sep)).stem)[1]
+
+
+def describe_package(dlc_root, filename):
+    # Index values of an installed package, read from the package itself.
+    package = Path(dlc_root, filename.replace(":", os.sep))
+    with ZipFile(package) as ZObject:
+        return {
+            "FileName": filename,
+            "FileSize": str(package.stat().st_size // 1000),
+            "UncompressedFileSize": str(ZObject.getinfo("1").file_size // 1000),
+            "IndexFileCRC": str(zlib.crc32(ZObject.read("0")) & 0xFFFFFFFF),
+        }
+
+
+def get_retained_path(dlc_root, filename):
+    return Path(dlc_root, REVISIONS_DIR, filename.replace(":", os.sep))
+
+
+def get_retained_files(dlc_root):
+    # Paths relative to dlc_root of every revision kept aside, which --gc must leave alone.
+    return {
+        get_retained_path(dlc_root, entry["FileName"]).relative_to(dlc_root)
+        for entries in load_revisions(dlc_root)["packages"].values()
+        for entry in entries
+    }
+
+
+def add_revision(revisions, entry):
+    entries = revisions["packages"].setdefault(get_package_key(entry["FileName"]), [])
+    entries[:] = [item for item in entries if item["FileName"] != entry["FileName"]]
+    entries.append(entry)
+    entries.sort(key=lambda item: get_revision(item["FileName"]) or 0, reverse=True)
+
+
+def retain_revisions(dlc_root, results, keep, served):
+    # Move the revisions replaced by the packages just built aside instead of removing them,
+    # then only keep the newest ones of each package. Index files must point to the new revisions already.
+    # Only revisions the server index pointed to before or after the run are kept, so packages of
+    # an unfinished run that never went live are left to be removed instead.
+    revisions = load_revisions(dlc_root)
+    for result in results:
+        if len(result["issues"]) > 0:
+            continue
+        for package in result["packages"]:
+            if package["filename"] == package["newfilename"]:
+                continue
+
+            filename = package["filename"].replace(os.sep, ":")
+            previous = Path(dlc_root, package["filename"])
+            if Path(package["filename"]) in served and previous.is_file() is True:
+                try:
+                    add_revision(revisions, describe_package(dlc_root, filename))
+                except (OSError, BadZipFile, KeyError):
+                    previous.unlink()
+                else:
+                    retained = get_retained_path(dlc_root, filename)
+                    retained.parent.mkdir(parents=True, exist_ok=True)
+                    os.replace(previous, retained)
+
+            if Path(package["newfilename"]) in served:
+                add_revision(
+                    revisions,
+                    {
+                        "FileName": package["newfilename"].replace(os.sep, ":"),
+                        "FileSize": package["filesize"],
+                        "UncompressedFileSize": package["unc_filesize"],
+                        "IndexFileCRC": package["crc"],
+                    },
+                )
+
+            # The newest revisions are kept, including the live one.
+            entries = revisions["packages"].get(get_package_key(filename), [])
+            for entry in entries[keep:]:
+                get_retained_path(dlc_root, entry["FileName"]).unlink(missing_ok=True)
+            del entries[keep:]
+
+    save_revisions(dlc_root, revisions)
+
+
+def select_revision(dlc_root, entries, current, to=None):
+    # Revision to roll back to: the newest one up to the given epoch time,
+    # or the one preceding the live revision. Revisions whose files are gone are skipped.
+    revision = get_revision(current) or 0
+    for entry in entries:
+        entry_revision = get_revision(entry["FileName"]) or 0
+        if (to is None and entry_revision < revision) or (
+            to is not None and entry_revision <= to
+        ):
+            if (
+                entry["FileName"] == current
+                or get_retained_path(dlc_root, entry["FileName"]).is_file() is True
+            ):
+                return entry
+    return None
+
+
+def rollback_packages(dlc_root, directories, to=None, components=None):
+    # Point the index files to previous revisions that were kept, without building anything.
+    server_index, server_tree = GetServerIndexTree(Path(dlc_root, "dlc"), "DlcIndex")
+    if server_index is None or server_tree is None:
+        colorprint(Style.BRIGHT + Fore.RED, "-> Server DLCIndex was not found!")
+        return
+
+    revisions = load_revisions(dlc_root)
+    names = {directory.name for directory in directories}
+    live = {
+        filename
+        for pkg in server_tree.getroot().iter("Package")
+        if (filename := GetSubElementAttributes(pkg, "FileName").get("val", None))
+        is not None
+    }
+
+    updates = dict()
+    for current in sorted(live):
+        key = get_package_key(current)
+        dlc, _, pkg_name = key.partition(":")
+        if dlc not in names or key not in revisions["packages"]:
+            continue
+        if components is not None and (
+            pkg_name not in components
+            and PACKAGE_NAME.fullmatch(pkg_name).group(1) not in components
+        ):
+            continue
+
+        entry = select_revision(dlc_root, revisions["packages"][key], current, to)
+        if entry is None or entry["FileName"] == current:
+            colorprint(
+                Style.BRIGHT + Fore.WHITE, f"- {current} has no other revision to use.", ""
+            )
+            continue
+        updates[current] = entry
+
+    if len(updates) == 0:
+        colorprint(Style.BRIGHT + Fore.GREEN, "-> Nothing to roll back!")
+        return
+
+    # Live revisions are kept as well, so a rollback can be undone.
+    for current in updates:
+        if get_revision(current) is not None and Path(
+            dlc_root, current.replace(":", os.sep)
+        ).is_file() is True and all(
+            entry["FileName"] != current
+            for entry in revisions["packages"][get_package_key(current)]
+        ):
+            add_revision(revisions, describe_package(dlc_root, current))
+
+    # Packages rolled back to are served again. They are made to look as recent as the
+    # packages they replace, so they are not packed again before their files change.
+    for current, entry in updates.items():
+        package = Path(dlc_root, entry["FileName"].replace(":", os.sep))
+        os.replace(get_retained_path(dlc_root, entry["FileName"]), package)
+        os.utime(package)
+
+    # Every package is repointed in a single write of the server index.
+    RepointPackages(server_tree.getroot(), updates)
+    ET.indent(server_tree, "  ")
+    WriteServerTree(server_index, server_tree)
+
+    for directory in directories:
+        dlc_index_file = Path(directory, f"DLCIndex-{directory.name}.xml")
+        if dlc_index_file.exists() is True:
+            tree = ET.parse(dlc_index_file)
+            if RepointPackages(tree.getroot(), updates) > 0:
+                write_local_index(dlc_index_file, tree)
+                colorprint(
+                    Style.BRIGHT + Fore.GREEN, f"-> Updated: {dlc_index_file.name}!", ""
+                )
+
+    # Revisions rolled back from are moved aside once nothing points to them anymore.
+    for current, entry in updates.items():
+        package = Path(dlc_root, current.replace(":", os.sep))
+        if package.is_file() is True:
+            retained = get_retained_path(dlc_root, current)
+            retained.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(package, retained)
+        colorprint(
+            Style.BRIGHT + Fore.YELLOW, f"- Rolled back {current} to {entry['FileName']}", ""
+        )
+
+    save_revisions(dlc_root, revisions)
+    colorprint(
+        Style.BRIGHT + Fore.GREEN,
+        f"\n-> {len(updates)} packages rolled back. Updated: {server_index.name}!",
+    )
@@ -0,0 +1,237 @@
+import copy
+import os
+import shutil
+import time
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from zipfile import BadZipFile, ZipFile
+from colorama import Fore, Style
+from tstodlc.tools.build import PACKAGE_NAME, index_packages, write_local_index
+from tstodlc.tools.index import (
+    GetIndexTree,
+    GetReferencedFiles,
+    GetServerIndexTree,
+    GetSubElementAttributes,
+    SearchPackages,
+    SplitRevision,
+)
+from tstodlc.tools.progress import colorprint, progress_str, report_progress
+from tstodlc.tools.zerofile import read_0_file
+
+
+def unpack_package(package, directory):
+    # Extract the files of a package into the folder of its component. File 1 is read straight from
+    # the package, members are extracted in the order they are stored so its stream only goes forward.
+    name, _, _ = PACKAGE_NAME.fullmatch(package.stem).groups()
+    subdirectory = Path(directory, name)
+    result = {
+        "package": str(package),
+        "component": name,
+        "files": 0,
+        "bytes": 0,
+        "priorities": [],
+        "issues": [],
+    }
+
+    try:
+        with ZipFile(package) as ZObject:
+            if "0" not in ZObject.namelist() or "1" not in ZObject.namelist():
+                result["issues"].append(f"{package.name} is not a package.")
+                return result
+            with ZObject.open("0") as f:
+                info = read_0_file(f)
+            if info is None:
+                result["issues"].append(f"{package.name} has an invalid 0 file.")
+                return result
+            result["priorities"] = sorted({file["priority"] for file in info["archived_files"]})
+
+            with ZObject.open("1") as f1, ZipFile(f1) as ZObject1:
+                for zinfo in sorted(ZObject1.infolist(), key=lambda zinfo: zinfo.header_offset):
+                    if zinfo.is_dir() is True:
+                        continue
+
+                    # Do not let members escape the folder of the component.
+                    target = Path(subdirectory, zinfo.filename).resolve()
+                    if target.is_relative_to(subdirectory.resolve()) is False:
+                        result["issues"].append(f"{zinfo.filename} is outside of {name}.")
+                        continue
+
+                    target.parent.mkdir(parents=True, exist_ok=True)
+                    with ZObject1.open(zinfo) as src, open(target, "wb") as dst:
+                        shutil.copyfileobj(src, dst, 1 << 20)
+                    mtime = time.mktime(zinfo.date_time + (0, 0, -1))
+                    os.utime(target, (mtime, mtime))
+
+                    result["files"] += 1
+                    result["bytes"] += zinfo.file_size
+
+    except (OSError, BadZipFile, EOFError) as error:
+        result["issues"].append(f"{package.name} can not be unpacked: {error}")
+
+    return result
+
+
+def get_server_packages(dlc_root, directory, server_tree):
+    # Packages of a DLC listed in the server index, or the newest revision of each one when there is no server index.
+    if server_tree is not None:
+        return sorted(
+            Path(dlc_root, path)
+            for path in GetReferencedFiles(server_tree)
+            if path.parent.name == directory.name
+            and path.suffix == ".zip"
+            and Path(dlc_root, path).is_file() is True
+        )
+
+    subtarget_dir = Path(dlc_root, directory.name)
+    if subtarget_dir.is_dir() is False:
+        return []
+    return sorted(
+        {
+            package
+            for packages in index_packages(subtarget_dir, False).values()
+            for package in packages.values()
+        }
+    )
+
+
+def write_unpacked_index(directory, packages, priority, server_tree):
+    # Recreate the local index with the entries the server index has for the unpacked packages.
+    dlc_index_file = Path(directory, f"DLCIndex-{directory.name}.xml")
+    tree = GetIndexTree(dlc_index_file, "DlcIndex")
+    root = tree.getroot()
+    root.set("priority", str(priority))
+    root.set(
+        "revision",
+        "1" if all(SplitRevision(package.stem)[1] is not None for package in packages) else "0",
+    )
+
+    if server_tree is not None:
+        server_root = server_tree.getroot()
+        for server_branch in [server_root] + [
+            server_root.find(tag) for tag in ["InitialPackages", "TutorialPackages"]
+        ]:
+            if server_branch is None:
+                continue
+            branch = root if server_branch is server_root else root.find(server_branch.tag)
+
+            for package in packages:
+                filename = str(package.relative_to(package.parent.parent))
+                for server_pkg in server_branch.findall("Package"):
+                    if (
+                        GetSubElementAttributes(server_pkg, "FileName").get("val", "")
+                        != filename.replace(os.sep, ":")
+                    ):
+                        continue
+                    # Branches are only created for packages that belong to them, since an empty
+                    # InitialPackages or TutorialPackages makes the next run add every package to it.
+                    if branch is None:
+                        branch = ET.SubElement(root, server_branch.tag)
+                    for pkg in SearchPackages(branch, filename):
+                        branch.remove(pkg)
+                    branch.insert(0, copy.deepcopy(server_pkg))
+
+    write_local_index(dlc_index_file, tree)
+    return dlc_index_file
+
+
+def report_unpack(result, n, total):
+    for issue in result["issues"]:
+        colorprint(Style.BRIGHT + Fore.RED, f"Warning! {issue}", "")
+
+    report_progress(
+        progress_str(
+            n,
+            total,
+            Style.BRIGHT
+            + Fore.YELLOW
+            + f"- Unpacked {Path(result['package']).name} into {result['component']}: {result['files']} files\n"
+            + Style.RESET_ALL,
+        ),
+        "",
+    )
+
+
+def unpack_packages(dlc_root, directories, jobs=1):
+    # Extract installed packages back into DLC directories, one folder per component.
+    server_index, server_tree = GetServerIndexTree(Path(dlc_root, "dlc"), "DlcIndex")
+    if server_index is None or server_tree is None:
+        colorprint(
+            Style.BRIGHT + Fore.YELLOW,
+            "-> Server DLCIndex was not found! The newest revision of each package will be unpacked.",
+        )
+        server_tree = None
+
+    tasks = [
+        (package, directory)
+        for directory in directories
+        for package in get_server_packages(dlc_root, directory, server_tree)
+    ]
+    if len(tasks) == 0:
+        colorprint(
+            Style.BRIGHT + Fore.RED,
+            "-> Warning! No installed packages found for the DLCs you have provided.",
+        )
+        return
+
+    results = dict()
+    if jobs > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            futures = {
+                executor.submit(unpack_package, package, directory): package
+                for package, directory in tasks
+            }
+            for future in as_completed(futures):
+                results[futures[future]] = future.result()
+                report_unpack(results[futures[future]], len(results), len(tasks))
+    else:
+        for package, directory in tasks:
+            results[package] = unpack_package(package, directory)
+            report_unpack(results[package], len(results), len(tasks))
+
+    for directory in directories:
+        packages = [
+            package
+            for package, package_directory in tasks
+            if package_directory == directory and len(results[package]["issues"]) == 0
+        ]
+        if len(packages) == 0:
+            continue
+
+        directory.mkdir(parents=True, exist_ok=True)
+
+        # The local index only has one priority for the whole DLC.
+        priorities = sorted(
+            {priority for package in packages for priority in results[package]["priorities"]}
+        )
+        if len(priorities) > 1:
+            colorprint(
+                Style.BRIGHT + Fore.YELLOW,
+                f"-> Warning! Packages of {directory.name} use priorities {priorities}. {priorities[-1]} will be used.",
+                "",
+            )
+        dlc_index_file = write_unpacked_index(
+            directory, packages, priorities[-1] if len(priorities) > 0 else 1, server_tree
+        )
+
+        # Keep the unpacked components from looking newer than their packages,
+        # so they are only packed again once they actually change.
+        for component in {results[package]["component"] for package in packages}:
+            if Path(directory, component).is_dir() is False:
+                continue
+            mtime = min(
+                package.stat().st_mtime
+                for package in packages
+                if results[package]["component"] == component
+            )
+            os.utime(Path(directory, component), (mtime - 1, mtime - 1))
+
+        colorprint(Style.BRIGHT + Fore.GREEN, f"-> Updated: {dlc_index_file.name}!", "")
+
+    colorprint(
+        Style.BRIGHT + Fore.GREEN,
+        f"\n-> {sum(len(result['issues']) == 0 for result in results.values())} packages unpacked with "
+        + f"{sum(result['files'] for result in results.values())} files and "
+        + f"{sum(result['bytes'] for result in results.values())} bytes!",
+    )
+
@@ -0,0 +1,53 @@
+from colorama import Fore, Style
+from tstodlc.tools.progress import colorprint
+from tstodlc.tools.zerofile import MAX_FILES, MAX_FILE_SIZE, check_0_limits
+
+
+def validate_component(subdirectory, sizes, args):
+    # Problems that would stop a scanned DLC component from being packed, followed by warnings.
+    if len(sizes) == 0:
+        return ([], [f"No files found at {subdirectory}. It will not be packed."])
+
+    errors = check_0_limits(subdirectory.name, list(sizes), sizes)
+
+    # Sharding is only allowed when asked for.
+    shard_size = MAX_FILE_SIZE if args.shard_size is None else args.shard_size * 1000000
+    shard_size = max(min(shard_size, MAX_FILE_SIZE), max(sizes.values()))
+    if args.shard is False and (
+        len(sizes) > MAX_FILES or sum(sizes.values()) > shard_size
+    ):
+        errors.append(
+            f"{len(sizes)} files with {sum(sizes.values())} bytes do not fit in a single 0 file. Use --shard."
+        )
+
+    return (errors, [])
+
+
+def validate_components(components, args):
+    # Check every component before anything is packed, so all problems are reported at once.
+    # Returns the number of errors found.
+    errors = 0
+    warnings = 0
+    for subdirectory, sizes in components:
+        component_errors, component_warnings = validate_component(subdirectory, sizes, args)
+        if len(component_errors) == 0 and len(component_warnings) == 0:
+            continue
+
+        colorprint(
+            Style.BRIGHT + (Fore.RED if len(component_errors) > 0 else Fore.YELLOW),
+            f"-> {subdirectory.parent.name}/{subdirectory.name}:",
+            "",
+        )
+        for error in component_errors:
+            colorprint(Style.BRIGHT + Fore.RED, f"- {error}", "")
+        for warning in component_warnings:
+            colorprint(Style.BRIGHT + Fore.YELLOW, f"- {warning}", "")
+
+        errors += len(component_errors)
+        warnings += len(component_warnings)
+
+    colorprint(
+        Style.BRIGHT + (Fore.RED if errors > 0 else Fore.GREEN),
+        f"\n-> {len(components)} components checked, {errors} errors and {warnings} warnings found!",
+    )
+    return errors
@@ -0,0 +1,114 @@
+from pathlib import Path
+from zipfile import ZipFile, is_zipfile
+from colorama import Fore, Style
+from tstodlc.tools import fileio
+from tstodlc.tools.progress import colorprint
+from tstodlc.tools.zerofile import read_0_file
+
+
+def view_0_file(file_0, filename, show = False):
+
+    # Check if 0 file really exists and it is not a directory.
+    if file_0.exists() is True:
+        with fileio.open_source(file_0) as f:
+            view_0_stream(f, filename, show)
+
+
+def view_zip_file(zip_file, filename, show = False):
+
+    # 0 file is read straight from the package, without extracting it.
+    with ZipFile(zip_file) as ZObject:
+        if "0" in ZObject.namelist():
+            with ZObject.open("0") as f:
+                view_0_stream(f, filename, show)
+            return True
+    return False
+
+
+def view_0_stream(f, filename, show = False):
+    info = read_0_file(f)
+    if info is None:
+        return
+
+    original_dir = info["original_dir"]
+    zip_files = info["zip_files"]
+    crc32 = info["crc32"]
+    archived_files = info["archived_files"] or [
+        {"name": "nofile.empty", "extension": "empty", "size": 0, "priority": 0}
+    ]
+
+    # To help with formating.
+    min_padding = max((len(file['name']) for file in archived_files))
+    delimiters = max(116, 81 + min_padding)
+
+    colorprint(Fore.LIGHTWHITE_EX, "=" * delimiters)
+    colorprint(
+        Fore.LIGHTWHITE_EX,
+        f"\n {filename} \n",
+    )
+
+    colorprint(Fore.LIGHTWHITE_EX, "-" * delimiters)
+
+    colorprint(Fore.WHITE, f"* Original directory: {original_dir}")
+    colorprint(Fore.WHITE, f"* First priority: {archived_files[0]['priority']}")
+    colorprint(Fore.WHITE, "* Archive list:")
+    colorprint(Fore.WHITE, f"- [0] --- CRC32: {crc32}")
+    for zip_file in zip_files:
+        colorprint(Fore.WHITE, f"- [{zip_file['name']}] --- CRC32: {zip_file['crc32']}")
+
+    # Print list of files if required.
+    if show is True:
+        colorprint(Fore.LIGHTWHITE_EX, "-" * delimiters)
+        colorprint(Fore.WHITE, f"{'PRIORITY':<9s}" + " " * 10 + f"{'NAME':<{min_padding}s}" + " " * 10 + f"{'DIRECTORY':<32s}")
+        colorprint(Fore.LIGHTWHITE_EX, "-" * delimiters)
+        for file in archived_files:
+            colorprint(Fore.WHITE, f"{file['priority']:<9d}" + " " * 10  + f"{file['name']:<{min_padding}s}" + " " * 10 + f"{str(filename.name):<32s}")
+        colorprint(Fore.LIGHTWHITE_EX, "-" * delimiters)
+
+
+def view_packages(directories, show=False):
+
+    print("\n")
+    status = False
+
+    # Search for subdirectories and zip files.
+    for directory in directories:
+        # Check if it is really a directory.
+        if directory.is_dir() is True:
+            file_0 = Path(directory, "0")
+            if file_0.exists() is True:
+                view_0_file(file_0, directory.relative_to(directory.parent.parent), show)
+                status = True
+
+            # Inspect all subdirectories and files if there is any.
+            for item in directory.iterdir():
+
+                # Normal subdirectories. Check 0 file presence and copy it to tempdir.
+                if item.is_dir():
+                    file_0 = Path(item, "0")
+                    if file_0.exists() is True:
+                        view_0_file(file_0, item.relative_to(directory.parent), show)
+                        status = True
+
+                # Zip files. Read their 0 file.
+                elif item.suffix == ".zip" and is_zipfile(item) is True:
+                    if view_zip_file(item, item.relative_to(directory.parent), show) is True:
+                        status = True
+
+
+        # Check if it instead is a zip file.
+        elif directory.suffix == ".zip" and is_zipfile(directory) is True:
+            if view_zip_file(directory, directory.relative_to(directory.parent.parent), show) is True:
+                status = True
+
+
+
+    if status is True:
+        if show is False:
+            colorprint(Fore.LIGHTWHITE_EX, "=" * 116)
+    else:
+        colorprint(
+            Style.BRIGHT + Fore.RED,
+            "  Warning! No DLC files for inspecting found under the arguments you have provided.",
+        )
+    print("\n")
@@ -0,0 +1,185 @@
+import os
+import zlib
+from pathlib import Path
+from tstodlc.tools import fileio
+
+
+# Limits of the 0 file format. Strings are stored with a 1 byte length that also counts the null byte,
+# the number of files with 2 bytes and the size of each file with 4 bytes. File 1 is kept within
+# 4 bytes as well, since it is not supposed to rely on zip64 extensions.
+MAX_STR_LENGTH = 0xFF - 1
+MAX_FILES = 0xFFFF
+MAX_FILE_SIZE = 0xFFFFFFFF
+
+SIGNATURE = b"\x42\x47\x72\x6d\x03\x02"
+
+
+def get_crc32(file):
+    # Files checked here are written by tstodlc itself, so they are not counted as source reads.
+    crc = 0
+    with open(file, "rb", buffering=fileio.BUFFER_SIZE) as f:
+        while chunk := f.read(fileio.BUFFER_SIZE):
+            crc = zlib.crc32(chunk, crc)
+    return crc & 0xFFFFFFFF
+
+
+def read_bytestr(file_descriptor, n):
+    return file_descriptor.read(n).rstrip(b"\x00").decode("utf8")
+
+
+def write_str_to_file(file_descriptor, str_name):
+    # String length.
+    str_bytes = str_name.encode()
+    skip = len(str_bytes) + 1
+    file_descriptor.write(skip.to_bytes())
+
+    # String.
+    file_descriptor.write(str_bytes)
+    file_descriptor.write(b"\x00")
+
+
+def read_0_file(f):
+    # Check 0 file signature.
+    if f.read(6) != SIGNATURE:
+        return None
+
+    # Read all info.
+    size_0 = int.from_bytes(f.read(4))
+
+    f.read(3)
+
+    original_dir = read_bytestr(f, int.from_bytes(f.read(1)))
+
+    zip_files = [{"name": "1", "crc32": "0"} for _ in range(int.from_bytes(f.read(2)))]
+
+    for zip_file in zip_files:
+        f.read(2)
+        zip_file["name"] = read_bytestr(f, int.from_bytes(f.read(1)))
+
+        f.read(1)
+        zip_file["crc32"] = str(int.from_bytes(f.read(4)))
+
+    number_files = int.from_bytes(f.read(2))
+
+    archived_files = [{"name": "nofile.empty", "extension": "empty", "size": 0, "priority": 0} for _ in range(number_files)]
+    for file in archived_files:
+        f.read(2)
+        file["name"] = read_bytestr(f, int.from_bytes(f.read(1)))
+        file["extension"] = read_bytestr(f, int.from_bytes(f.read(1)))
+        f.read(int.from_bytes(f.read(1)))
+        file["size"] = int.from_bytes(f.read(4))
+        file["priority"] = int.from_bytes(f.read(2))
+        f.read(2)
+
+    crc32 = int.from_bytes(f.read(4))
+
+    return {
+        "size": size_0,
+        "original_dir": original_dir,
+        "zip_files": zip_files,
+        "archived_files": archived_files,
+        "crc32": crc32,
+    }
+
+
+def check_0_limits(pkg_name, files, sizes=None):
+    # Issues that can not be solved by sharding the component.
+    issues = []
+    if len((pkg_name + "-part" + str(MAX_FILES) + "/1").encode()) > MAX_STR_LENGTH:
+        issues.append(f"{pkg_name} is longer than the 0 file allows.")
+
+    # Only the name of each file is stored, so files of nested directories must not share it.
+    paths = dict()
+    for file in files:
+        paths.setdefault(file.name, []).append(file)
+        if len(file.name.encode()) > MAX_STR_LENGTH:
+            issues.append(f"{file.name} is longer than {MAX_STR_LENGTH} bytes.")
+        elif (file.stat().st_size if sizes is None else sizes[file]) > MAX_FILE_SIZE:
+            issues.append(f"{file.name} is bigger than {MAX_FILE_SIZE} bytes.")
+    for name, duplicates in paths.items():
+        if len(duplicates) > 1:
+            common = os.path.commonpath(duplicates)
+            issues.append(
+                f"{name} is found {len(duplicates)} times: "
+                + ", ".join(os.path.relpath(file, common) for file in duplicates)
+            )
+    return issues
+
+
+def write_0_file(file_0, file_1, files, pkg_name, priority):
+    write_0_entries(
+        file_0,
+        file_1,
+        [(file.name, file.stat().st_size, priority) for file in files],
+        pkg_name,
+    )
+
+
+def write_0_entries(file_0, file_1, entries, pkg_name):
+    # Entries are the name, size and priority of each archived file.
+    with open(file_0, "wb") as f0:
+        # Write 0 file signature.
+        f0.write(SIGNATURE)
+
+        # Reserve 4 bytes for 0 file size.
+        # Fill it up later.
+        f0.write(b"\x00\x00\x00\x00")
+
+        # Biggest amount of allocated bytes.
+        longest_filename = sorted(
+            [name for name, _, _ in entries], key=lambda name: len(name.encode()), reverse=True
+        )[0]
+        longest_length = (
+            len(longest_filename.encode()) * 2
+            + len(Path(longest_filename).suffix[1:].encode())
+            + 14
+        )
+        f0.write(longest_length.to_bytes(length=2))
+
+        f0.write(b"\x00")
+
+        # Full filepath.
+        write_str_to_file(f0, pkg_name + "/1")
+
+        # Number of zipped files and allocated space for filename and crc32.
+        f0.write(b"\x00\x01\x00\x08")
+
+        # 1 filename.
+        write_str_to_file(f0, file_1.stem)
+
+        # Unknown but doesn't seem to change between files.
+        f0.write(b"\x01")
+
+        # File 1 crc32.
+        f0.write(get_crc32(file_1).to_bytes(length=4))
+
+        # Number of files.
+        f0.write(len(entries).to_bytes(length=2))
+
+        for name, file_size, priority in entries:
+            # File skip.
+            extension = Path(name).suffix[1:]
+            skip = 2 * len(name.encode()) + len(extension.encode()) + 14
+            f0.write(skip.to_bytes(length=2))
+
+            # Filename, extension, internal filename, file size.
+            write_str_to_file(f0, name)
+            write_str_to_file(f0, extension)
+            write_str_to_file(f0, name)
+            f0.write(file_size.to_bytes(length=4))
+
+            # Priority value or build number value.
+            f0.write(priority.to_bytes(length=2))
+
+            # Unknown but doesn't seem to change between files.
+            f0.write(b"\x00\x00")
+
+        # Write 0 file size.
+        f0_size = f0.tell() + 4
+        f0.seek(6)
+        f0.write(f0_size.to_bytes(length=4))
+
+    # Partial file 0 crc32.
+    with open(file_0, "rb+") as f0:
+        file_0_crc32 = zlib.crc32(f0.read()) & 0xFFFFFFFF
+        f0.write(file_0_crc32.to_bytes(length=4))
@@ -0,0 +1,102 @@
+import io
+import os
+import sys
+import time
+import zlib
+import xml.etree.ElementTree as ET
+from pathlib import Path
+from zipfile import ZIP_DEFLATED, ZipFile
+import pytest
+from tstodlc.tools.pack import main
+
+
+SERVER_INDEX = "DLCIndex-Server.zip"
+
+
+def make_server(root):
+    # Empty server DLC repository, with a master index pointing to its server index.
+    dlc = Path(root, "dlc")
+    dlc.mkdir(parents=True)
+    with ZipFile(Path(dlc, "DLCIndex.zip"), "w", ZIP_DEFLATED) as ZObject:
+        ZObject.writestr(
+            "DLCIndex.xml",
+            f'<MasterDLCIndex><IndexFile index="dlc:{SERVER_INDEX}"/></MasterDLCIndex>',
+        )
+    with ZipFile(Path(dlc, SERVER_INDEX), "w", ZIP_DEFLATED) as ZObject:
+        ZObject.writestr(
+            Path(SERVER_INDEX).stem + ".xml",
+            "<DlcIndex><InitialPackages /><TutorialPackages /></DlcIndex>",
+        )
+    return Path(root)
+
+
+def make_dlc(root, name, components):
+    # DLC directory with one subdirectory per component, each holding the given files.
+    directory = Path(root, name)
+    for component, files in components.items():
+        for filename, data in files.items():
+            file = Path(directory, component, filename)
+            file.parent.mkdir(parents=True, exist_ok=True)
+            file.write_bytes(data)
+    return directory
+
+
+def read_server_index(server):
+    with ZipFile(Path(server, "dlc", SERVER_INDEX)) as ZObject:
+        return ET.fromstring(ZObject.read(Path(SERVER_INDEX).stem + ".xml"))
+
+
+def read_local_index(directory):
+    return ET.parse(Path(directory, f"DLCIndex-{directory.name}.xml")).getroot()
+
+
+def get_packages(root):
+    # FileName and IndexFileCRC of the packages of each branch of an index.
+    branches = {root.tag: root}
+    branches.update({branch.tag: branch for branch in root if branch.tag != "Package"})
+    return {
+        tag: {
+            pkg.find("FileName").get("val"): pkg.find("IndexFileCRC").get("val")
+            for pkg in branch.findall("Package")
+        }
+        for tag, branch in branches.items()
+    }
+
+
+def get_package_crc(server, filename):
+    # Crc32 of the 0 file within an installed package, the value IndexFileCRC must hold.
+    with ZipFile(Path(server, filename.replace(":", "/"))) as ZObject:
+        return str(zlib.crc32(ZObject.read("0")) & 0xFFFFFFFF)
+
+
+def touch(directory):
+    # Make a DLC component look changed, as the rebuild decision compares modification times.
+    for path in [directory, *directory.rglob("*")]:
+        os.utime(path)
+
+
+class Runner:
+    # Run tstodlc as the command line would, moving the clock forward between runs so each run
+    # gets its own revision.
+    def __init__(self, monkeypatch):
+        self.monkeypatch = monkeypatch
+        self.now = time.time()
+
+    def __call__(self, *args):
+        self.now += 10
+        now = self.now
+        self.monkeypatch.setattr(time, "time", lambda: now)
+        self.monkeypatch.setattr(sys, "argv", ["tstodlc", *map(str, args)])
+        self.monkeypatch.setattr(sys, "stdout", io.StringIO())
+        main()
+        return sys.stdout.getvalue()
+
+
+@pytest.fixture
+def tstodlc(monkeypatch):
+    return Runner(monkeypatch)
+
+
+@pytest.fixture
+def server(tmp_path):
+    return make_server(Path(tmp_path, "server"))
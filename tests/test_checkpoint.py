@@ -0,0 +1,90 @@
+from pathlib import Path
+import pytest
+from tstodlc.tools import build, install
+from tstodlc.tools.checkpoint import CHECKPOINT_FILE
+from conftest import get_package_crc, get_packages, make_dlc, read_server_index, touch
+
+
+COMPONENTS = {
+    "buildings": {"a.rgb": b"a" * 50000},
+    "textpools": {"b.txt": b"b" * 5000},
+}
+
+
+def get_live(server):
+    packages = get_packages(read_server_index(server))["DlcIndex"]
+    for filename, crc in packages.items():
+        assert get_package_crc(server, filename) == crc
+    return sorted(packages)
+
+
+def get_zips(server):
+    return sorted(f"FirstDLC:{path.name}" for path in Path(server, "FirstDLC").glob("*.zip"))
+
+
+def run_unfinished(tstodlc, monkeypatch, *args, packed=None):
+    # Stop a run once the given number of packages are written, or before any index file is written.
+    with monkeypatch.context() as mp:
+        if packed is None:
+            mp.setattr(install, "GetServerIndexTree", lambda *args: 1 / 0)
+        else:
+            written = []
+            write_0_file = build.write_0_file
+
+            def fail(*args):
+                if len(written) == packed:
+                    raise ZeroDivisionError
+                written.append(args)
+                write_0_file(*args)
+
+            mp.setattr(build, "write_0_file", fail)
+        with pytest.raises(ZeroDivisionError):
+            tstodlc(*args)
+
+
+def install_then_change(tmp_path, server, tstodlc):
+    first = make_dlc(tmp_path, "FirstDLC", COMPONENTS)
+    tstodlc(first, server)
+    for component in COMPONENTS:
+        touch(Path(first, component))
+    return first, get_live(server)
+
+
+def test_unfinished_run_keeps_served_packages(tmp_path, server, tstodlc, monkeypatch):
+    first, live = install_then_change(tmp_path, server, tstodlc)
+    run_unfinished(tstodlc, monkeypatch, first, server)
+
+    # The index files still point to packages that were not removed.
+    assert get_live(server) == live
+    assert set(live) < set(get_zips(server))
+    assert Path(server, CHECKPOINT_FILE).exists() is True
+
+
+def test_resume_reuses_packed_components(tmp_path, server, tstodlc, monkeypatch):
+    first, live = install_then_change(tmp_path, server, tstodlc)
+    run_unfinished(tstodlc, monkeypatch, first, server, packed=1)
+    unfinished = sorted(set(get_zips(server)) - set(live))
+    assert len(unfinished) == 1
+
+    # The package written before the failure goes live as it is, only the other one is packed again.
+    output = tstodlc("--resume", first, server)
+    assert output.count("was packed by the previous run!") == 1
+    after = get_live(server)
+    assert unfinished[0] in after
+    assert len(set(after) - set(live)) == 2
+    assert get_zips(server) == after
+    assert Path(server, CHECKPOINT_FILE).exists() is False
+
+
+def test_discarded_checkpoint_packs_again(tmp_path, server, tstodlc, monkeypatch):
+    first, live = install_then_change(tmp_path, server, tstodlc)
+    run_unfinished(tstodlc, monkeypatch, first, server)
+    unfinished = sorted(set(get_zips(server)) - set(live))
+    assert len(unfinished) == 2
+
+    # Without --resume every component is packed again, and nothing unreferenced is left behind.
+    tstodlc(first, server)
+    after = get_live(server)
+    assert set(after).isdisjoint(live) and set(after).isdisjoint(unfinished)
+    assert get_zips(server) == after
+    assert Path(server, CHECKPOINT_FILE).exists() is False
@@ -0,0 +1,44 @@
+from pathlib import Path
+from conftest import SERVER_INDEX, make_dlc, read_local_index, read_server_index
+
+
+COMPONENTS = {
+    "buildings": {"a.rgb": b"a" * 5000},
+    "textpools": {"b.txt": b"b" * 5000},
+}
+
+
+def get_tiers(root):
+    return sorted(pkg.get("tier") for pkg in root.iter("Package"))
+
+
+def get_index_files(first, server):
+    return [Path(first, "DLCIndex-FirstDLC.xml"), Path(server, "dlc", SERVER_INDEX)]
+
+
+def test_index_only_without_changes_writes_nothing(tmp_path, server, tstodlc):
+    first = make_dlc(tmp_path, "FirstDLC", COMPONENTS)
+    tstodlc(first, server)
+    index_files = get_index_files(first, server)
+    before = [(file.stat().st_mtime_ns, file.read_bytes()) for file in index_files]
+
+    for args in (["-i"], []):
+        tstodlc(*args, first, server)
+        assert [(file.stat().st_mtime_ns, file.read_bytes()) for file in index_files] == before
+
+
+def test_index_only_updates_entries(tmp_path, server, tstodlc):
+    first = make_dlc(tmp_path, "FirstDLC", COMPONENTS)
+    tstodlc(first, server)
+    zips = sorted(Path(server, "FirstDLC").glob("*.zip"))
+    assert get_tiers(read_server_index(server)) == ["all", "all"]
+
+    # Entries get the new options without anything being packed again.
+    output = tstodlc("-i", "--tier", "100", first, server)
+    assert "2 package entries of FirstDLC were updated!" in output
+    assert get_tiers(read_local_index(first)) == ["100", "100"]
+    assert get_tiers(read_server_index(server)) == ["100", "100"]
+    assert sorted(Path(server, "FirstDLC").glob("*.zip")) == zips
+
+    output = tstodlc("-i", "--tier", "100", first, server)
+    assert "0 package entries of FirstDLC were updated!" in output
@@ -0,0 +1,52 @@
+from pathlib import Path
+from zipfile import ZipFile
+import pytest
+from tstodlc.tools import build
+from conftest import make_dlc
+
+
+FILES = {"a.rgb": b"a" * 5000, "b.xml": b"<b/>" * 100}
+
+
+def test_nozip_keeps_no_state_in_target(tmp_path, tstodlc):
+    first = make_dlc(tmp_path, "FirstDLC", {"buildings": FILES})
+    target = Path(tmp_path, "target")
+    target.mkdir()
+    tstodlc("--nozip", first, target)
+    tstodlc("--nozip", first, target)
+
+    # The target holds app files only, without the history kept for server installs.
+    assert sorted(path.name for path in target.iterdir()) == ["buildings"]
+    assert sorted(path.name for path in Path(target, "buildings").iterdir()) == ["0", "1"]
+
+
+def test_nozip_writes_packages_in_place(tmp_path, tstodlc):
+    first = make_dlc(tmp_path, "FirstDLC", {"buildings": FILES})
+    target = Path(tmp_path, "target")
+    target.mkdir()
+    tstodlc("--nozip", first, target)
+    with ZipFile(Path(target, "buildings", "1")) as ZObject:
+        assert {name: ZObject.read(name) for name in ZObject.namelist()} == FILES
+
+    # Files are replaced by a new run, without leaving temporary files behind.
+    Path(first, "buildings", "a.rgb").write_bytes(b"c" * 5000)
+    tstodlc("--nozip", first, target)
+    with ZipFile(Path(target, "buildings", "1")) as ZObject:
+        assert ZObject.read("a.rgb") == b"c" * 5000
+    assert sorted(path.name for path in Path(target, "buildings").iterdir()) == ["0", "1"]
+
+
+def test_nozip_keeps_previous_files_until_complete(tmp_path, tstodlc, monkeypatch):
+    first = make_dlc(tmp_path, "FirstDLC", {"buildings": FILES})
+    target = Path(tmp_path, "target")
+    target.mkdir()
+    tstodlc("--nozip", first, target)
+    previous = {path.name: path.read_bytes() for path in Path(target, "buildings").iterdir()}
+
+    # A run that fails before its files are complete leaves the previous ones in place.
+    Path(first, "buildings", "a.rgb").write_bytes(b"c" * 5000)
+    monkeypatch.setattr(build, "write_0_file", lambda *args: 1 / 0)
+    with pytest.raises(ZeroDivisionError):
+        tstodlc("--nozip", first, target)
+    for name, data in previous.items():
+        assert Path(target, "buildings", name).read_bytes() == data
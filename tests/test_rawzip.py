@@ -0,0 +1,183 @@
+import argparse
+import io
+import os
+import time
+import zipfile
+from pathlib import Path
+from zipfile import ZIP_DEFLATED, ZIP_STORED, ZipFile
+from tstodlc.tools.build import build_component
+from tstodlc.tools.cache import find_blob, write_member
+from tstodlc.tools.fileio import ReadAhead
+from tstodlc.tools.rawzip import LOCAL_HEADER, RawZipWriter
+
+
+DATE_TIME = (2024, 5, 17, 12, 30, 10)
+
+MEMBERS = {
+    "textures/big.rgb": os.urandom(300000) + bytes(700000),
+    "textures/empty.rgb": b"",
+    "scripts/åäö.xml": b"<xml>" * 5000,
+}
+
+
+def write_archive(compression):
+    f = io.BytesIO()
+    with RawZipWriter(f) as writer:
+        for name, data in MEMBERS.items():
+            writer.write(name, io.BytesIO(data), DATE_TIME, compression)
+    return f
+
+
+def make_args(**options):
+    args = {
+        "shard": False,
+        "shard_size": None,
+        "nozip": False,
+        "norevision": False,
+        "compression": "deflated",
+        "outer_compression": "deflated",
+        "compress_level": None,
+    }
+    args.update(options)
+    return argparse.Namespace(**args)
+
+
+def make_component(tmp_path):
+    component = Path(tmp_path, "MyDLC", "buildings")
+    for name, data in MEMBERS.items():
+        Path(component, name).parent.mkdir(parents=True, exist_ok=True)
+        Path(component, name).write_bytes(data)
+    target = Path(tmp_path, "server", "MyDLC")
+    target.mkdir(parents=True)
+    return component, target
+
+
+def test_write_round_trip():
+    for compression in (ZIP_DEFLATED, ZIP_STORED):
+        f = write_archive(compression)
+        with ZipFile(f) as ZObject:
+            assert ZObject.testzip() is None
+            assert ZObject.namelist() == list(MEMBERS)
+            for zinfo in ZObject.infolist():
+                assert ZObject.read(zinfo) == MEMBERS[zinfo.filename]
+                assert zinfo.compress_type == compression
+                assert zinfo.date_time == DATE_TIME
+                assert zinfo.create_system == 3
+
+                # Crc and sizes patched into the local header match the central directory.
+                f.seek(zinfo.header_offset)
+                fields = LOCAL_HEADER.unpack(f.read(LOCAL_HEADER.size))
+                assert fields[6:9] == (zinfo.CRC, zinfo.compress_size, zinfo.file_size)
+
+
+def test_copy_keeps_compressed_data():
+    src = write_archive(ZIP_DEFLATED)
+    dst = io.BytesIO()
+    with ZipFile(src) as ZObject, RawZipWriter(dst) as writer:
+        for zinfo in ZObject.infolist():
+            writer.copy(src, zinfo)
+
+    with ZipFile(src) as original, ZipFile(dst) as copied:
+        assert copied.testzip() is None
+        for zinfo, other in zip(original.infolist(), copied.infolist()):
+            assert (other.filename, other.CRC, other.compress_size, other.file_size) == (
+                zinfo.filename,
+                zinfo.CRC,
+                zinfo.compress_size,
+                zinfo.file_size,
+            )
+            assert copied.read(other) == MEMBERS[zinfo.filename]
+
+
+def test_cache_miss_then_hit(tmp_path):
+    component, _ = make_component(tmp_path)
+    cache_dir = Path(tmp_path, "cache")
+    files = sorted(file for file in component.rglob("*") if file.is_file() is True)
+
+    archives = []
+    for hits in (0, len(files)):
+        cached = {
+            file: blob
+            for file in files
+            if (blob := find_blob(cache_dir, file, ZIP_DEFLATED, None)) is not None
+        }
+        assert len(cached) == hits
+
+        f = io.BytesIO()
+        with (
+            ReadAhead([file for file in files if file not in cached]) as reader,
+            RawZipWriter(f) as writer,
+        ):
+            taken = sum(
+                write_member(
+                    writer,
+                    reader,
+                    file,
+                    file.relative_to(component).as_posix(),
+                    cache_dir,
+                    ZIP_DEFLATED,
+                    None,
+                    cached.get(file),
+                )
+                for file in files
+            )
+        assert taken == hits
+        with ZipFile(f) as ZObject:
+            assert ZObject.testzip() is None
+            for file in files:
+                assert ZObject.read(file.relative_to(component).as_posix()) == file.read_bytes()
+        archives.append(f.getvalue())
+
+    # Spliced members are the very same bytes that were compressed.
+    assert archives[0] == archives[1]
+
+
+def test_changed_file_is_compressed_again(tmp_path):
+    component, _ = make_component(tmp_path)
+    cache_dir = Path(tmp_path, "cache")
+    file = Path(component, "scripts", "åäö.xml")
+
+    with ReadAhead([file]) as reader, RawZipWriter(io.BytesIO()) as writer:
+        write_member(writer, reader, file, file.name, cache_dir, ZIP_DEFLATED, None)
+    assert find_blob(cache_dir, file, ZIP_DEFLATED, None) is not None
+
+    # Same size and modification time, other contents.
+    stat = file.stat()
+    file.write_bytes(b"<lmx>" * 5000)
+    os.utime(file, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert find_blob(cache_dir, file, ZIP_DEFLATED, None) is None
+
+
+def test_rebuild_keeps_index_crc(tmp_path):
+    component, target = make_component(tmp_path)
+    cache_dir = Path(tmp_path, "cache")
+    args = make_args()
+
+    first = build_component(component, target, dict(), 1, 1700000000, args, cache_dir=cache_dir)
+    assert first["issues"] == [] and first["cached"] == 0
+
+    package = Path(target, "buildings-r1700000000.zip")
+    time.sleep(0.01)
+    second = build_component(
+        component, target, {"buildings": package}, 1, 1700000001, args, cache_dir=cache_dir
+    )
+    assert second["issues"] == [] and second["cached"] == len(MEMBERS)
+    assert second["packages"][0]["crc"] == first["packages"][0]["crc"]
+
+    # The previous revision is only removed once the index files point to the new one.
+    assert package.exists() is True
+    with ZipFile(Path(target, "buildings-r1700000001.zip")) as ZObject:
+        assert ZObject.testzip() is None
+        with ZipFile(io.BytesIO(ZObject.read("1"))) as file_1:
+            assert file_1.testzip() is None
+            for name, data in MEMBERS.items():
+                assert file_1.read(name) == data
+
+
+def test_zipfile_reads_empty_archive():
+    f = io.BytesIO()
+    with RawZipWriter(f):
+        pass
+    with ZipFile(f) as ZObject:
+        assert ZObject.namelist() == []
+    assert zipfile.is_zipfile(f) is True
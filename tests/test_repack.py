@@ -0,0 +1,50 @@
+from pathlib import Path
+from zipfile import ZIP_STORED, ZipFile
+from conftest import (
+    get_package_crc,
+    get_packages,
+    make_dlc,
+    read_local_index,
+    read_server_index,
+)
+
+
+def make_dlcs(tmp_path):
+    return [
+        make_dlc(tmp_path, "FirstDLC", {"buildings": {"a.rgb": b"a" * 5000}}),
+        make_dlc(tmp_path, "SecondDLC", {"textpools": {"b.txt": b"b" * 5000}}),
+    ]
+
+
+def assert_server_crcs(server):
+    packages = get_packages(read_server_index(server))["DlcIndex"]
+    assert len(packages) > 0
+    for filename, crc in packages.items():
+        assert get_package_crc(server, filename) == crc
+    return packages
+
+
+def test_repack_then_pack_keeps_crcs(tmp_path, server, tstodlc):
+    first, second = make_dlcs(tmp_path)
+    tstodlc(first, second, server)
+    before = assert_server_crcs(server)
+
+    tstodlc("--repack", "--outer_compression", "stored", first, server)
+    after = assert_server_crcs(server)
+
+    # Only the packages of the given DLC get new revisions.
+    assert [name for name in after if name.startswith("SecondDLC:")] == [
+        name for name in before if name.startswith("SecondDLC:")
+    ]
+    repacked = [name for name in after if name.startswith("FirstDLC:")]
+    assert len(repacked) == 1 and repacked[0] not in before
+    with ZipFile(Path(server, repacked[0].replace(":", "/"))) as ZObject:
+        assert all(zinfo.compress_type == ZIP_STORED for zinfo in ZObject.infolist())
+
+    # The local index follows the server, so a normal run does not point it back.
+    local = get_packages(read_local_index(first))["DlcIndex"]
+    assert local == {name: crc for name, crc in after.items() if name.startswith("FirstDLC:")}
+
+    tstodlc(first, second, server)
+    assert assert_server_crcs(server) == after
+
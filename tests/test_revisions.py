@@ -0,0 +1,105 @@
+import json
+from pathlib import Path
+import pytest
+from tstodlc.tools import install
+from conftest import get_package_crc, get_packages, make_dlc, read_server_index, touch
+
+
+FILES = {"a.rgb": b"a" * 5000}
+
+
+def get_live(server):
+    packages = get_packages(read_server_index(server))["DlcIndex"]
+    assert len(packages) == 1
+    for filename, crc in packages.items():
+        assert get_package_crc(server, filename) == crc
+    return next(iter(packages))
+
+
+def get_kept(server):
+    with open(Path(server, ".tstodlc", "revisions.json"), "r") as f:
+        return [
+            entry["FileName"]
+            for entries in json.load(f)["packages"].values()
+            for entry in entries
+        ]
+
+
+def run_unfinished(tstodlc, *args):
+    # Stop a run after packing, before any index file is written.
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(install, "GetServerIndexTree", lambda *args: 1 / 0)
+        with pytest.raises(ZeroDivisionError):
+            tstodlc(*args)
+
+
+def test_keep_revisions_then_rollback(tmp_path, server, tstodlc):
+    first = make_dlc(tmp_path, "FirstDLC", {"buildings": FILES})
+    tstodlc(first, server)
+    revisions = [get_live(server)]
+    for _ in range(2):
+        touch(Path(first, "buildings"))
+        tstodlc("--keep_revisions", "3", first, server)
+        revisions.append(get_live(server))
+    assert get_kept(server) == revisions[::-1]
+
+    # Only the live revision is left within the DLC directory.
+    assert [path.name for path in Path(server, "FirstDLC").glob("*.zip")] == [
+        revisions[2].split(":")[1]
+    ]
+
+    tstodlc("--rollback", first, server)
+    assert get_live(server) == revisions[1]
+
+    # The package rolled back to is not packed again by a normal run.
+    tstodlc("--keep_revisions", "3", first, server)
+    assert get_live(server) == revisions[1]
+
+
+def test_unfinished_run_is_not_kept(tmp_path, server, tstodlc):
+    first = make_dlc(tmp_path, "FirstDLC", {"buildings": FILES})
+    tstodlc(first, server)
+    live = get_live(server)
+
+    touch(Path(first, "buildings"))
+    run_unfinished(tstodlc, "--keep_revisions", "3", first, server)
+    assert get_live(server) == live
+    unfinished = [
+        path for path in Path(server, "FirstDLC").glob("*.zip") if path.name != live.split(":")[1]
+    ]
+    assert len(unfinished) == 1
+
+    # Its package never went live, so it is neither kept nor left behind.
+    tstodlc("--keep_revisions", "3", first, server)
+    assert get_kept(server) == [get_live(server), live]
+    assert unfinished[0].exists() is False
+    assert Path(server, ".tstodlc", "revisions", unfinished[0].relative_to(server)).exists() is False
+
+
+def test_resumed_run_keeps_previous_revision(tmp_path, server, tstodlc):
+    first = make_dlc(tmp_path, "FirstDLC", {"buildings": FILES})
+    tstodlc(first, server)
+    live = get_live(server)
+
+    touch(Path(first, "buildings"))
+    run_unfinished(tstodlc, "--keep_revisions", "3", first, server)
+
+    # The package of the unfinished run is reused and goes live, the one it replaces is kept.
+    tstodlc("--resume", "--keep_revisions", "3", first, server)
+    assert get_live(server) != live
+    assert get_kept(server) == [get_live(server), live]
+
+    tstodlc("--rollback", first, server)
+    assert get_live(server) == live
+
+
+def test_repack_then_rollback(tmp_path, server, tstodlc):
+    first = make_dlc(tmp_path, "FirstDLC", {"buildings": FILES})
+    tstodlc(first, server)
+    live = get_live(server)
+
+    tstodlc("--repack", "--outer_compression", "stored", "--keep_revisions", "2", first, server)
+    assert get_kept(server) == [get_live(server), live]
+
+    tstodlc("--rollback", first, server)
+    assert get_live(server) == live
@@ -0,0 +1,51 @@
+from pathlib import Path
+from conftest import (
+    get_package_crc,
+    get_packages,
+    make_dlc,
+    read_local_index,
+    read_server_index,
+    touch,
+)
+
+
+FILES = {"a.rgb": b"a" * 5000, "b.xml": b"<b/>" * 100}
+
+
+def test_unpack_then_pack_keeps_branches(tmp_path, server, tstodlc):
+    first = make_dlc(tmp_path, "FirstDLC", {"buildings": FILES})
+    second = make_dlc(tmp_path, "SecondDLC", {"textpools": FILES})
+    tstodlc(first, server)
+    tstodlc("--initial", second, server)
+    before = get_packages(read_server_index(server))
+    assert list(before["InitialPackages"]) == [
+        name for name in before["DlcIndex"] if name.startswith("SecondDLC:")
+    ]
+
+    # Both DLCs are unpacked somewhere else, then packed again from there.
+    unpacked = [Path(tmp_path, "unpacked", "FirstDLC"), Path(tmp_path, "unpacked", "SecondDLC")]
+    for directory in unpacked:
+        directory.mkdir(parents=True)
+    tstodlc("--unpack", *unpacked, server)
+    for name, data in FILES.items():
+        assert Path(unpacked[0], "buildings", name).read_bytes() == data
+        assert Path(unpacked[1], "textpools", name).read_bytes() == data
+
+    # Only the branches that hold packages of a DLC are recreated locally.
+    assert read_local_index(unpacked[0]).find("InitialPackages") is None
+    assert read_local_index(unpacked[0]).find("TutorialPackages") is None
+    assert read_local_index(unpacked[1]).find("InitialPackages") is not None
+
+    for directory in unpacked:
+        touch(Path(directory, "buildings" if directory.name == "FirstDLC" else "textpools"))
+    tstodlc(*unpacked, server)
+
+    after = get_packages(read_server_index(server))
+    assert set(after) == set(before)
+    assert len(after["InitialPackages"]) == 1
+    assert [name.split("-r")[0] for name in after["InitialPackages"]] == [
+        name.split("-r")[0] for name in before["InitialPackages"]
+    ]
+    assert after.get("TutorialPackages", dict()) == before.get("TutorialPackages", dict())
+    for filename, crc in after["DlcIndex"].items():
+        assert get_package_crc(server, filename) == crc